@@ -0,0 +1,126 @@
+"""Bootstrap confidence intervals for the cutoffs and the summary of one ORF.
+
+The reported values of an ORF are computed from its scores as in
+`mynotebook.trim_outliers` and `mynotebook.summarize`: the cutoffs are the
+`outliers` and `1 - outliers` quantiles, and the mean and median are those
+of the scores between them. Each resample draws as many scores as there are,
+with replacement, and recomputes all four.
+
+Resamples are drawn as matrices of indices into the sorted scores. Sorting
+each row of indices sorts the resample, after which every statistic is a
+lookup or a difference of prefix sums. The resamples are split into blocks
+of fixed size, each with its own seed spawned from the given one, so the
+intervals only depend on the seed and not on how many processes drew them.
+"""
+
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+STATISTICS = ("lower_cutoff", "upper_cutoff", "mean", "median")
+
+# Resamples drawn by one task.
+BLOCK_SIZE = 256
+
+
+@dataclass
+class Interval:
+    estimate: float
+    low: float
+    high: float
+
+
+@dataclass
+class Intervals:
+    """Confidence intervals of the reported values of one ORF."""
+
+    confidence: float
+    lower_cutoff: Interval
+    upper_cutoff: Interval
+    mean: Interval
+    median: Interval
+
+
+def sorted_statistics(rows: np.ndarray, outliers: float) -> np.ndarray:
+    """`STATISTICS` of each of the sorted `rows`, as columns."""
+    count, n = rows.shape
+
+    # np.quantile with its default, linear interpolation.
+    def quantile(q):
+        position = (n - 1) * q
+        below = int(np.floor(position))
+        above = min(below + 1, n - 1)
+        return rows[:, below] + (position - below) * (rows[:, above] - rows[:, below])
+
+    lower, upper = quantile(outliers), quantile(1 - outliers)
+    # The trimmed scores are those between the cutoffs, both included.
+    start = (rows < lower[:, None]).sum(axis=1)
+    stop = (rows <= upper[:, None]).sum(axis=1)
+    kept = stop - start
+
+    prefix = np.zeros((count, n + 1))
+    np.cumsum(rows, axis=1, out=prefix[:, 1:])
+    every = np.arange(count)
+    # Cutoffs between two neighbouring scores can leave none of them.
+    empty = kept == 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(empty, np.nan, (prefix[every, stop] - prefix[every, start]) / kept)
+    middle = np.minimum(start + np.maximum(kept - 1, 0) // 2, n - 1), np.minimum(start + kept // 2, n - 1)
+    median = np.where(empty, np.nan, (rows[every, middle[0]] + rows[every, middle[1]]) / 2)
+    return np.column_stack([lower, upper, mean, median])
+
+
+def resample_statistics(ordered: np.ndarray, outliers: float, count: int,
+                        seed: np.random.SeedSequence) -> np.ndarray:
+    """`sorted_statistics` of `count` resamples of the sorted scores `ordered`."""
+    n = len(ordered)
+    rng = np.random.default_rng(seed)
+    dtype = np.uint16 if n <= np.iinfo(np.uint16).max else np.int64
+    indices = rng.integers(0, n, size=(count, n), dtype=dtype)
+    # A stable sort of small integers is a radix sort.
+    indices.sort(axis=1, kind="stable")
+    return sorted_statistics(ordered[indices], outliers)
+
+
+@dataclass
+class Bootstrap:
+    """How to compute `Intervals`, see `intervals`.
+
+    Without an `executor`, resamples are drawn in this process.
+    """
+
+    resamples: int = 2000
+    confidence: float = 0.95
+    seed: int = 0
+    executor: Optional[Executor] = None
+
+    def intervals(self, scores: Sequence[float], outliers: float) -> Optional[Intervals]:
+        """Percentile intervals of the cutoffs, mean and median of the untrimmed `scores`."""
+        if len(scores) == 0:
+            return None
+
+        ordered = np.sort(np.asarray(scores, dtype=float))
+        sizes = [min(BLOCK_SIZE, self.resamples - start) for start in range(0, self.resamples, BLOCK_SIZE)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        if self.executor is None:
+            blocks = map(resample_statistics, [ordered] * len(sizes), [outliers] * len(sizes), sizes, seeds)
+        else:
+            blocks = self.executor.map(resample_statistics, [ordered] * len(sizes), [outliers] * len(sizes), sizes, seeds)
+        statistics = np.concatenate(list(blocks))
+
+        estimates = sorted_statistics(ordered[None, :], outliers)[0]
+        tail = (1 - self.confidence) / 2
+        # Resamples that trim away every score have no mean or median.
+        low, high = np.nanquantile(statistics, [tail, 1 - tail], axis=0)
+        return Intervals(self.confidence, *(Interval(float(estimate), float(a), float(b))
+                                            for estimate, a, b in zip(estimates, low, high)))
+
+
+def make_executor(jobs: Optional[int] = None) -> Optional[Executor]:
+    """A process pool of `jobs` workers, by default one per CPU, or None for a single one."""
+    jobs = jobs or os.cpu_count() or 1
+    return ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
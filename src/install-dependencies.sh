@@ -13,4 +13,5 @@ curl -LsSf https://astral.sh/uv/install.sh > "/tmp/uv-install.sh"
 sh "/tmp/uv-install.sh"
 cp -v -f -- ~/.local/bin/uv ~/.local/bin/uvx /bin
 
-uv sync
+# Fail instead of re-resolving if uv.lock does not match pyproject.toml.
+uv sync --locked
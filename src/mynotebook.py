@@ -1,21 +1,36 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import csv
+from collections import OrderedDict
 from dataclasses import dataclass
 from itertools import zip_longest
-import statistics
-import Levenshtein
-from Bio import Align
-from scipy.stats import gaussian_kde
+from typing import Optional
 
+from bootstrap import Bootstrap, Interval, Intervals
 from mynotebook_data import get_joined
+from profiling import stage
+
+# Plotting, KDE and alignment libraries take longer to import than the text
+# statistics take to compute, so they are imported by the functions that use
+# them. `src/test-import-time.py` checks that print_results.py loads none.
 
 
 interactive_mode = None
 
+# KDE method used for the plots, see `compute_kde`.
+kde_method = "auto"
+
+# With "auto", samples at least this large use the binned KDE.
+BINNED_KDE_MIN_POINTS = 2000
+
+# Largest grid of `binned_kde`. With "auto", samples that would need a finer
+# grid use the exact KDE.
+BINNED_KDE_MAX_GRID_POINTS = 2**20
+
 
 def show_graphics():
     if interactive_mode is True:
+        import matplotlib.pyplot as plt
+
         plt.show()
 
 
@@ -59,7 +74,63 @@ def compute_kde_bandwidth(scores):
     return max(h, 0.01)
 
 
-def compute_kde(scores, num_points=1000, bw_method=None):
+def binned_kde_refinement(x_vals, bandwidth):
+    """Grid points per step of `x_vals` that make the grid step at most a quarter of `bandwidth`."""
+    return max(1, int(np.ceil(4 * (x_vals[1] - x_vals[0]) / bandwidth)))
+
+
+def binned_kde(scores_array, x_vals, bandwidth, max_grid_points=BINNED_KDE_MAX_GRID_POINTS):
+    """Gaussian KDE evaluated on the evenly spaced `x_vals` by binning.
+
+    Points are linearly binned onto a grid and the bin weights are convolved
+    with the Gaussian kernel via FFT, which costs O(m log m) for m grid points
+    instead of O(n * m). The grid is refined until its step is at most a
+    quarter of the bandwidth, which keeps the deviation from the exact KDE
+    below 1% of its peak, reached by tight clusters between grid points,
+    and around 2e-5 of it for smooth samples.
+
+    A bandwidth narrow for the range of `x_vals` would need more than
+    `max_grid_points` grid points. The grid is then capped, and the
+    deviation grows with the square of its step: up to about 3% of the peak
+    with a step of half the bandwidth, and 9% with a step of one bandwidth.
+    `compute_kde(..., method="auto")` uses the exact KDE instead.
+
+    Args:
+        scores_array: Array of numeric values, all within [x_vals[0], x_vals[-1]]
+        x_vals: Evenly spaced points to evaluate the KDE at
+        bandwidth: Standard deviation of the Gaussian kernel
+        max_grid_points: Upper limit on the size of the refined grid
+
+    Returns:
+        Density values at `x_vals`
+    """
+    step = x_vals[1] - x_vals[0]
+    refinement = max(1, min(binned_kde_refinement(x_vals, bandwidth), max_grid_points // len(x_vals)))
+    grid_step = step / refinement
+    grid_size = (len(x_vals) - 1) * refinement + 1
+
+    # Linear binning: each point is split between its two neighbouring nodes.
+    position = (scores_array - x_vals[0]) / grid_step
+    position = np.clip(position, 0, grid_size - 1)
+    left = np.floor(position).astype(np.int64)
+    right_weight = position - left
+    weights = np.bincount(left, weights=1 - right_weight, minlength=grid_size + 1)
+    weights += np.bincount(left + 1, weights=right_weight, minlength=grid_size + 1)
+    weights = weights[:grid_size]
+
+    offsets = np.arange(-(grid_size - 1), grid_size) * grid_step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    kernel /= len(scores_array) * bandwidth * np.sqrt(2 * np.pi)
+
+    from scipy.signal import fftconvolve
+
+    density = fftconvolve(weights, kernel, mode="full")[grid_size - 1 : 2 * grid_size - 1]
+    # FFT round-off can produce tiny negative values far from the data.
+    density = np.maximum(density, 0)
+    return density[::refinement]
+
+
+def compute_kde(scores, num_points=1000, bw_method=None, method="exact"):
     """Compute KDE for a set of scores.
 
     Args:
@@ -67,10 +138,17 @@ def compute_kde(scores, num_points=1000, bw_method=None):
         num_points: Number of points to evaluate KDE at
         bw_method: Bandwidth method ('silverman', 'scott', or numeric value)
                    If None, uses Silverman's rule
+        method: 'exact' evaluates every kernel at every point with
+                `gaussian_kde`, 'binned' uses `binned_kde`, and 'auto' picks
+                'binned' for samples of at least `BINNED_KDE_MIN_POINTS` values
+                whose grid fits in `BINNED_KDE_MAX_GRID_POINTS`
 
     Returns:
         (x_values, density_values) tuple for plotting
     """
+    if method not in ("exact", "binned", "auto"):
+        raise ValueError(f"Invalid choice of KDE method: {method!r}")
+
     if len(scores) < 2:
         return None, None
 
@@ -96,6 +174,8 @@ def compute_kde(scores, num_points=1000, bw_method=None):
         else:
             return None, None
 
+    from scipy.stats import gaussian_kde
+
     # Create KDE
     try:
         kde = gaussian_kde(scores_array, bw_method=bw_method)
@@ -105,7 +185,15 @@ def compute_kde(scores, num_points=1000, bw_method=None):
     # Evaluate KDE
     try:
         x_vals = np.linspace(x_min - 0.1 * x_range, x_max + 0.1 * x_range, num_points)
-        density = kde(x_vals)
+        # Same bandwidth as the exact KDE, which scales its factor by std.
+        bandwidth = np.sqrt(kde.covariance[0, 0])
+        if method == "auto":
+            fits = binned_kde_refinement(x_vals, bandwidth) <= BINNED_KDE_MAX_GRID_POINTS // len(x_vals)
+            method = "binned" if len(scores) >= BINNED_KDE_MIN_POINTS and fits else "exact"
+        if method == "exact":
+            density = kde(x_vals)
+        else:
+            density = binned_kde(scores_array, x_vals, bandwidth)
 
         # Check for invalid values
         if np.any(np.isnan(density)) or np.any(np.isinf(density)):
@@ -165,52 +253,89 @@ def scale_kde_to_histogram(density, x_vals, bins, counts):
     return density * scale_factor
 
 
-def print_statistics(name, scores):
-    # Calculate statistics
-    mean = statistics.mean(scores) if scores else 0
-    median = statistics.median(scores) if scores else 0
-    try:
-        mode = statistics.mode(scores)
-    except BaseException:
-        mode = None
-    stdev = statistics.stdev(scores) if len(scores) > 1 else 0
-    # variance = statistics.variance(scores) if len(scores) > 1 else 0
-    min_score = min(scores) if scores else float("inf")
-    max_score = max(scores) if scores else 0
-
-    # Print statistics
-    print(f"Name: {name}")
-    print(f"Count: {len(scores)}")
-    print(f"Mean: {round(mean, 2)}")
-    print(f"Median: {round(median, 2)}")
-    print(f"Mode: {round(mode, 2) if mode is not None else 'undefined'}")
-    print(f"Standard Deviation: {round(stdev, 2)}")
-    print(f"Minimum: {min_score}")
-    print(f"Maximum: {max_score}")
-
+@dataclass
+class Summary:
+    count: int
+    mean: float
+    median: float
+    mode: Optional[float]
+    stdev: float
+    minimum: float
+    maximum: float
+    # Of the values above and of the cutoffs, see `bootstrap.Bootstrap`.
+    intervals: Optional[Intervals] = None
+
+
+def summarize(scores) -> Summary:
+    """Summary statistics of `scores`, with NumPy.
+
+    Count, mean, standard deviation, minimum and maximum take one vectorized
+    pass each, and the median and mode come from one `np.unique`. Results
+    are those of the `statistics` module, including their types: integer
+    scores give an integer minimum, maximum, mode and, when they are exact,
+    mean and median.
+    """
+    scores = np.asarray(scores)
+    if scores.dtype == object:
+        scores = scores.astype(float)
+    scores = scores.ravel()
+    count = len(scores)
+    if count == 0:
+        return Summary(0, 0, 0, None, 0, float("inf"), 0)
+
+    integral = scores.dtype.kind in "iu"
+
+    def scalar(value):
+        return value.item() if integral else float(value)
+
+    if integral:
+        total = int(scores.sum(dtype=np.int64))
+        quotient, remainder = divmod(total, count)
+        mean = total / count if remainder else quotient
+    else:
+        mean = float(scores.mean())
+    stdev = float(scores.std(ddof=1)) if count > 1 else 0
+
+    values, firsts, counts = np.unique(scores, return_index=True, return_counts=True)
+    cumulative = np.cumsum(counts)
+    below, above = np.searchsorted(cumulative, [(count - 1) // 2, count // 2], side="right")
+    if count % 2:
+        median = scalar(values[above])
+    else:
+        median = (scalar(values[below]) + scalar(values[above])) / 2
+    # Of the most common values, the one that occurs first.
+    most_common = counts == counts.max()
+    mode = scalar(values[most_common][np.argmin(firsts[most_common])])
+    return Summary(count, mean, median, mode, stdev, scalar(values[0]), scalar(values[-1]))
 
-def levenshtein_distance(s1, s2):
-    return Levenshtein.distance(s1, s2)
 
+def format_interval(confidence: float, interval: Interval) -> str:
+    return f"({round(confidence * 100)}% CI: {round(interval.low, 4)} to {round(interval.high, 4)})"
 
-aligner = Align.PairwiseAligner()
-aligner.mode = "global"
-aligner.match_score = 2
-aligner.mismatch_score = -1
-aligner.open_gap_score = -1.5
-aligner.extend_gap_score = -0.2
 
+def print_summary(name, summary):
+    intervals = summary.intervals
+    print(f"Name: {name}")
+    print(f"Count: {summary.count}")
+    if intervals is None:
+        print(f"Mean: {round(summary.mean, 2)}")
+        print(f"Median: {round(summary.median, 2)}")
+    else:
+        print(f"Mean: {round(summary.mean, 2)} {format_interval(intervals.confidence, intervals.mean)}")
+        print(f"Median: {round(summary.median, 2)} {format_interval(intervals.confidence, intervals.median)}")
+    print(f"Mode: {round(summary.mode, 2) if summary.mode is not None else 'undefined'}")
+    print(f"Standard Deviation: {round(summary.stdev, 2)}")
+    print(f"Minimum: {summary.minimum}")
+    print(f"Maximum: {summary.maximum}")
+    if intervals is not None:
+        for label, interval in [("Lower cutoff", intervals.lower_cutoff), ("Upper cutoff", intervals.upper_cutoff)]:
+            print(f"{label}: {round(interval.estimate, 4)} {format_interval(intervals.confidence, interval)}")
 
-def aligner_distance(query, reference):
-    if len(query) == 0:
-        return float("inf")
 
-    orf_alignments = aligner.align(query, reference)
-    if not orf_alignments:
-        return float("inf")
+def levenshtein_distance(s1, s2):
+    import Levenshtein
 
-    orf_alignment = orf_alignments[0]
-    return (-1 * orf_alignment.score) / len(query) + aligner.match_score
+    return Levenshtein.distance(s1, s2)
 
 
 ORFs = [
@@ -245,37 +370,25 @@ def ranged(name, start, end, generator):
 
 
 def get_distance_scores_nw(orf, joined):
-    for val in joined:
-        if val["region"] == orf:
-            yield val["distance"]
+    return joined.loc[joined["region"] == orf, "distance"].tolist()
 
 
 def get_size_scores_nw(orf, joined):
-    for val in joined:
-        if val["region"] == orf:
-            aminos = val["protein"]
-            yield len(aminos) * 3
+    lengths = joined.loc[joined["region"] == orf, "protein_length"]
+    return (lengths * 3).tolist()
 
 
 def get_nostopcodon_size_scores_nw(orf, joined):
-    for val in joined:
-        if val["region"] == orf:
-            aminos = val["aminoacids"]
-            yield len(aminos)
+    return joined.loc[joined["region"] == orf, "aminoacids_length"].tolist()
 
 
 def get_asize_scores_nw(orf, joined):
-    for val in joined:
-        if val["region"] == orf:
-            astart = val["start"]
-            aend = val["end"]
-            yield aend - astart + 1
+    selected = joined.loc[joined["region"] == orf]
+    return (selected["end"] - selected["start"] + 1).tolist()
 
 
 def get_indel_scores_nw(orf, joined):
-    for val in joined:
-        if val["region"] == orf:
-            yield float(val["indel_impact"])
+    return joined.loc[joined["region"] == orf, "indel_impact"].astype(float).tolist()
 
 
 def get_scores_all(orf, metric, outliers, joined):
@@ -293,9 +406,29 @@ def get_scores_all(orf, metric, outliers, joined):
         raise ValueError(f"Invalid choice of metric: {metric}")
 
 
-def get_scores(orf, metric, outliers, joined):
-    data = get_scores_all(orf, metric, outliers, joined)
+def get_metric_scores(metric, joined):
+    """Scores of every row of `joined`, with the name and range of the metric."""
+    if metric == "distance":
+        return "Distance", 0, 2, joined["distance"]
+    elif metric == "size (protein)":
+        return "Size", None, None, joined["protein_length"] * 3
+    elif metric == "size":
+        return "Size", None, None, joined["end"] - joined["start"] + 1
+    elif metric == "indel impact":
+        return "indel_impact", None, None, joined["indel_impact"].astype(float)
+    else:
+        raise ValueError(f"Invalid choice of metric: {metric}")
 
+
+def get_scores_by_orf(metric, joined):
+    """Untrimmed scores of all ORFs, grouped in a single pass over `joined`."""
+    name, start, end, scores = get_metric_scores(metric, joined)
+    groups = scores.groupby(joined["region"], observed=True, sort=False)
+    grouped = {orf: group.tolist() for orf, group in groups}
+    return {orf: Data(name, grouped.get(orf, []), start, end) for orf in ORFs}
+
+
+def trim_outliers(data, outliers):
     # outliers = 0.01 # percentage of outliers
     lower_threshold = np.quantile(data.scores, outliers) if data.scores else 0
 
@@ -303,14 +436,15 @@ def get_scores(orf, metric, outliers, joined):
     # lower_threshold = np.percentile(data.scores, outliers * 100)
     # upper_threshold = np.percentile(data.scores, 100 - (outliers * 100))
 
-    # print(f'orf  : {orf}')
     # print(f'lower: {lower_threshold}')
     # print(f'upper: {upper_threshold}')
 
-    data.scores = [
-        x for x in data.scores if x >= lower_threshold and x <= upper_threshold
-    ]
-    return data
+    scores = [x for x in data.scores if x >= lower_threshold and x <= upper_threshold]
+    return Data(data.name, scores, data.start, data.end)
+
+
+def get_scores(orf, metric, outliers, joined):
+    return trim_outliers(get_scores_all(orf, metric, outliers, joined), outliers)
 
 
 def compute_histogram_bins(scores, numrange=None, default_bins=30):
@@ -378,11 +512,11 @@ def filter_based_on_intactness(goodq, joined, metric):
 
     Args:
         goodq: If True, return intact sequences; if False, return defective
-        joined: List of sequence dictionaries
+        joined: Table of sequences, see `mynotebook_data.load_joined`
         metric: Metric being analyzed ('size', 'distance', 'indel impact', etc.)
 
-    Yields:
-        Sequence dictionaries matching the intactness criteria
+    Returns:
+        Rows of `joined` matching the intactness criteria
     """
     # Select appropriate intactness field based on metric
     if metric == "size" or metric == "size (protein)":
@@ -395,69 +529,105 @@ def filter_based_on_intactness(goodq, joined, metric):
         # Default to most basic check for unknown metrics
         intact_field = "size_structural_intact"
 
-    for val in joined:
-        if val[intact_field] == goodq:
-            yield val
+    return joined[joined[intact_field] == goodq]
 
 
-def show_it(orf, data):
-    scores = data.scores
-    numrange = [data.start, data.end] if data.start is not None else None
+@dataclass
+class Histogram:
+    """Everything needed to draw and describe one distribution."""
 
-    # Compute appropriate bins for the data
-    bins = compute_histogram_bins(scores, numrange)
+    name: str
+    counts: np.ndarray
+    bin_edges: np.ndarray
+    kde_x: Optional[np.ndarray]
+    kde_y: Optional[np.ndarray]
+    summary: Summary
 
-    # Create histogram
-    counts, bin_edges, patches = plt.hist(
-        scores, bins=bins, edgecolor="black", range=numrange, alpha=0.7
-    )
+    @property
+    def nbytes(self):
+        arrays = [self.counts, self.bin_edges, self.kde_x, self.kde_y]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+
+def compute_histogram(data, bins, kde=True):
+    numrange = [data.start, data.end] if data.start is not None else None
+    counts, bin_edges = np.histogram(data.scores, bins=bins, range=numrange)
 
-    # Compute and plot KDE
-    x_vals, density = compute_kde(scores)
+    # Scale KDE to touch histogram at its peak
+    if kde:
+        with stage("compute_kde", len(data.scores)):
+            x_vals, density = compute_kde(data.scores, method=kde_method)
+    else:
+        x_vals, density = None, None
     if x_vals is not None and density is not None:
-        # Scale KDE to touch histogram at its peak
-        scaled_density = scale_kde_to_histogram(density, x_vals, bin_edges, counts)
-        plt.plot(x_vals, scaled_density, "r-", linewidth=2, label="KDE", alpha=0.8)
-        plt.legend()
-
-    plt.xlabel(data.name)
-    plt.ylabel("Count")
-    plt.title(f"Distribution of {orf}")
+        density = scale_kde_to_histogram(density, x_vals, bin_edges, counts)
+    else:
+        x_vals, density = None, None
+
+    return Histogram(data.name, counts, bin_edges, x_vals, density, summarize(data.scores))
+
+
+def show_it(orf, data):
+    (histogram,) = compute_views([data])
+    show_histogram(orf, histogram)
+
+
+def show_histogram(orf, histogram):
+    import matplotlib.pyplot as plt
+
+    draw_histogram(plt.gca(), orf, histogram)
     show_graphics()
 
 
+def draw_histogram(ax, orf, histogram):
+    ax.hist(
+        histogram.bin_edges[:-1],
+        bins=histogram.bin_edges,
+        weights=histogram.counts,
+        edgecolor="black",
+        alpha=0.7,
+    )
+
+    if histogram.kde_x is not None:
+        ax.plot(histogram.kde_x, histogram.kde_y, "r-", linewidth=2, label="KDE", alpha=0.8)
+        ax.legend()
+
+    ax.set_xlabel(histogram.name)
+    ax.set_ylabel("Count")
+    ax.set_title(f"Distribution of {orf}")
+
+
 def show_two(orf, data_good, data_bad):
-    scores_good = data_good.scores
-    scores_bad = data_bad.scores
-    numrange = [data_good.start, data_good.end] if data_good.start is not None else None
+    show_two_histograms(orf, *compute_views([data_good, data_bad]))
 
-    # Compute bins based on the combined data to ensure consistency
-    all_scores = list(scores_good) + list(scores_bad)
-    bins = compute_histogram_bins(all_scores, numrange)
+
+def show_two_histograms(orf, good, bad):
+    import matplotlib.pyplot as plt
 
     fig, ax1 = plt.subplots()
+    draw_two_histograms(ax1, orf, good, bad)
+    show_graphics()
+
+
+def draw_two_histograms(ax1, orf, good, bad):
     ax2 = ax1.twinx()  # instantiate a second axes that shares the same x-axis
 
     ax1.set_ylabel("Intact count")
-    counts_good, bins_good, _ = ax1.hist(
-        scores_good,
-        bins=bins,
+    ax1.hist(
+        good.bin_edges[:-1],
+        bins=good.bin_edges,
+        weights=good.counts,
         alpha=0.5,
         label="Intact",
         edgecolor="black",
         color="black",
-        range=numrange,
     )
 
-    # Compute and plot KDE for intact
-    x_vals_good, density_good = compute_kde(scores_good)
-    if x_vals_good is not None and density_good is not None:
-        scaled_density_good = scale_kde_to_histogram(
-            density_good, x_vals_good, bins_good, counts_good
-        )
+    # Plot KDE for intact
+    if good.kde_x is not None:
         ax1.plot(
-            x_vals_good,
-            scaled_density_good,
+            good.kde_x,
+            good.kde_y,
             "darkblue",
             linewidth=2,
             label="Intact KDE",
@@ -466,25 +636,21 @@ def show_two(orf, data_good, data_bad):
         )
 
     ax2.set_ylabel("Defective count")
-    counts_bad, bins_bad, _ = ax2.hist(
-        scores_bad,
-        bins=bins,
+    ax2.hist(
+        bad.bin_edges[:-1],
+        bins=bad.bin_edges,
+        weights=bad.counts,
         alpha=0.5,
         label="Defective",
         edgecolor="black",
         color="red",
-        range=numrange,
     )
 
-    # Compute and plot KDE for defective
-    x_vals_bad, density_bad = compute_kde(scores_bad)
-    if x_vals_bad is not None and density_bad is not None:
-        scaled_density_bad = scale_kde_to_histogram(
-            density_bad, x_vals_bad, bins_bad, counts_bad
-        )
+    # Plot KDE for defective
+    if bad.kde_x is not None:
         ax2.plot(
-            x_vals_bad,
-            scaled_density_bad,
+            bad.kde_x,
+            bad.kde_y,
             "darkred",
             linewidth=2,
             label="Defective KDE",
@@ -492,44 +658,71 @@ def show_two(orf, data_good, data_bad):
             linestyle="--",
         )
 
-    plt.xlabel(data_good.name)
-    plt.title(f"Distribution of {orf}")
+    ax2.set_xlabel(good.name)
+    ax2.set_title(f"Distribution of {orf}")
 
     # Combine legends from both axes
     lines1, labels1 = ax1.get_legend_handles_labels()
     lines2, labels2 = ax2.get_legend_handles_labels()
     ax1.legend(lines1 + lines2, labels1 + labels2, loc="best")
 
-    fig.tight_layout()
-    show_graphics()
+    ax1.figure.tight_layout()
 
 
-def process_orf(joined, orf, metric, outliers):
-    scores = get_scores(orf, metric, outliers, joined)
+def draw_views(fig, orf, views):
+    """Draw the histograms of one ORF on `fig`, after clearing it, so that one figure serves many."""
+    fig.clf()
+    if len(views) == 1:
+        draw_histogram(fig.add_subplot(), orf, views[0])
+    else:
+        draw_two_histograms(fig.add_subplot(), orf, *views)
 
-    # print(f"scores: {scores.scores[:10]}")
 
-    show_it(orf, scores)
-    # print(pd.DataFrame(np.array(scores.scores, dtype=float)).describe())
-    print_statistics(orf, scores.scores)
-    print("------------------------------------------")
+def compute_views(scores, kde=True):
+    """Histograms of one ORF: one per selection, with shared bins.
 
+    Without `kde`, only what the text statistics need.
+    """
+    first = scores[0]
+    numrange = [first.start, first.end] if first.start is not None else None
 
-def process_two_orfs(joined, orf, metric, outliers):
-    good = filter_based_on_intactness(True, joined, metric)
-    bad = filter_based_on_intactness(False, joined, metric)
-    scores_good = get_scores(orf, metric, outliers, good)
-    scores_bad = get_scores(orf, metric, outliers, bad)
-    show_two(orf, scores_good, scores_bad)
+    # Compute bins based on the combined data to ensure consistency
+    all_scores = [x for data in scores for x in data.scores]
+    bins = compute_histogram_bins(all_scores, numrange)
+    return [compute_histogram(data, bins, kde) for data in scores]
+
+
+def report_views(orf, views, draw=True):
+    if len(views) == 1:
+        (view,) = views
+        if draw:
+            show_histogram(orf, view)
+        print_summary(orf, view.summary)
+        print("------------------------------------------")
+        return
+
+    good, bad = views
+    if draw:
+        show_two_histograms(orf, good, bad)
 
     print("Intact:")
-    print_statistics(orf, scores_good.scores)
+    print_summary(orf, good.summary)
     print("")
     print("Nonintact:")
-    print_statistics(orf, scores_bad.scores)
+    print_summary(orf, bad.summary)
     print("------------------------------------------")
 
 
+def process_orf(orf, scores):
+    # print(f"scores: {scores.scores[:10]}")
+
+    report_views(orf, compute_views([scores]))
+
+
+def process_two_orfs(orf, scores_good, scores_bad):
+    report_views(orf, compute_views([scores_good, scores_bad]))
+
+
 def dump_data(joined):
     with open("output/data.csv", "w") as f:
         writer = csv.writer(f)
@@ -546,6 +739,8 @@ def show_size_examples():
     import ipywidgets as widgets
     from ipywidgets import interactive
 
+    from protein_distance import aligner_distance
+
     def fx(reference, query):
         print(f"distance(a, b) = {aligner_distance(reference, query)}")
         print(f"levenshtein(a, b) = {levenshtein_distance(reference, query)}")
@@ -582,46 +777,149 @@ def show_size_examples():
     # display(w)
 
 
-def show_all_orfs(joined, extractedby, select, metric, outliers):
-    if metric == "distance":
-        show_size_examples()
+class ViewCache:
+    """Least recently used cache of computed ORF views, bounded in memory.
 
-    for orf in ORFs:
-        if select == "together":
-            process_orf(joined, orf, metric, outliers)
-        elif select == "intact":
-            process_orf(
-                filter_based_on_intactness(True, joined, metric), orf, metric, outliers
-            )
-        elif select == "nonintact":
-            process_orf(
-                filter_based_on_intactness(False, joined, metric), orf, metric, outliers
-            )
-        elif select == "separately":
-            process_two_orfs(joined, orf, metric, outliers)
-        else:
-            raise ValueError(f"Invalid choice of select: {select}")
+    Keys are widget states, values are lists of `Histogram`. Once the arrays
+    held by the cache exceed `max_bytes`, the oldest entries are dropped.
+    """
 
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        views = self.entries.get(key)
+        if views is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return views
+
+    def put(self, key, views):
+        if key in self.entries:
+            self.nbytes -= sum(view.nbytes for view in self.entries.pop(key))
+        self.entries[key] = views
+        self.nbytes += sum(view.nbytes for view in views)
+
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= sum(view.nbytes for view in evicted)
+
+    def report(self):
+        return (
+            f"View cache: {self.hits} hits, {self.misses} misses, "
+            f"{len(self.entries)} entries, {self.nbytes / 2**20:.1f} MiB"
+        )
 
-def jupyter_main():
+
+def count_estimated(joined, metric):
+    """Rows of `joined` whose `metric` is estimated rather than exact.
+
+    Those are the distances that `make-individual-plasma-csv --fast-path`
+    estimated from score bounds, which are upper bounds of the exact ones.
+    """
+    if metric == "distance" and "distance_estimated" in joined:
+        return int(joined["distance_estimated"].to_numpy(dtype=bool).sum())
+    return 0
+
+
+def get_selections(joined, select, metric):
+    if select == "together":
+        return [joined]
+    elif select == "intact":
+        return [filter_based_on_intactness(True, joined, metric)]
+    elif select == "nonintact":
+        return [filter_based_on_intactness(False, joined, metric)]
+    elif select == "separately":
+        return [
+            filter_based_on_intactness(True, joined, metric),
+            filter_based_on_intactness(False, joined, metric),
+        ]
+    else:
+        raise ValueError(f"Invalid choice of select: {select}")
+
+
+def compute_orf_views(joined, select, metric, outliers, orfs=ORFs, bootstrap: Optional[Bootstrap] = None, kde=True):
+    with stage("select_scores", len(joined)):
+        selections = get_selections(joined, select, metric)
+        by_orf = [get_scores_by_orf(metric, selection) for selection in selections]
+    with stage("compute_views"):
+        views = {
+            orf: compute_views([trim_outliers(scores[orf], outliers) for scores in by_orf], kde)
+            for orf in orfs
+        }
+    if bootstrap is not None:
+        with stage("bootstrap"):
+            for orf in orfs:
+                for view, scores in zip(views[orf], by_orf):
+                    view.summary.intervals = bootstrap.intervals(scores[orf].scores, outliers)
+    return views
+
+
+def show_all_orfs(joined, extractedby, select, metric, outliers, cache=None, bootstrap: Optional[Bootstrap] = None, draw=None):
+    """Report the distributions of all ORFs.
+
+    Figures are drawn only if `draw`, which defaults to whether this is the
+    interactive notebook. Otherwise nobody would see them; see
+    `src/render-figures` for saving them instead.
+    """
+    if draw is None:
+        draw = interactive_mode is True
+    if metric == "distance":
+        show_size_examples()
+    estimated = count_estimated(joined, metric)
+    if estimated:
+        # They are kept: they are the distances far from the thresholds of
+        # the fast path, and leaving them out would cut off the tails.
+        print(f"Warning: {estimated} of {len(joined)} distances are estimated upper bounds "
+              f"(make-individual-plasma-csv --fast-path), not exact distances.")
+
+    if cache is None:
+        views = compute_orf_views(joined, select, metric, outliers, bootstrap=bootstrap, kde=draw)
+    else:
+        resampling = None if bootstrap is None else (bootstrap.resamples, bootstrap.confidence, bootstrap.seed)
+        keys = {orf: (extractedby, metric, outliers, select, orf, resampling, draw) for orf in ORFs}
+        views = {orf: cache.get(key) for orf, key in keys.items()}
+        missing = [orf for orf, value in views.items() if value is None]
+        if missing:
+            computed = compute_orf_views(joined, select, metric, outliers, missing, bootstrap, kde=draw)
+            for orf, value in computed.items():
+                cache.put(keys[orf], value)
+                views[orf] = value
+
+    with stage("report_views"):
+        for orf in ORFs:
+            report_views(orf, views[orf], draw)
+
+
+def jupyter_main(cache_max_bytes=64 * 2**20):
     import ipywidgets as widgets
     from ipywidgets import interact
 
     global interactive_mode
     interactive_mode = True
 
+    view_cache = ViewCache(cache_max_bytes)
+
     def interactable(extractedby, metric, outliers):
         if extractedby == "Los Alamos/Plasma":
-            joined = list(get_joined(source="los-alamos/plasma"))
+            joined = get_joined(source="los-alamos/plasma")
         elif extractedby == "CFEIntact/All":
-            joined = list(get_joined(source="cfeintact/all"))
+            joined = get_joined(source="cfeintact/all")
         elif extractedby == "CFEIntact/Plasma":
-            joined = list(get_joined(source="cfeintact/plasma"))
+            joined = get_joined(source="cfeintact/plasma")
         else:
             raise ValueError(f"Unexpected extractedby: {extractedby!r}.")
 
         def cont(select):
-            show_all_orfs(joined, extractedby, select, metric, outliers)
+            show_all_orfs(joined, extractedby, select, metric, outliers, view_cache)
+            print(view_cache.report())
 
         interact(
             cont,
@@ -3,11 +3,25 @@
 This module implements progressive intactness filtering based on CFEIntact defect categories.
 """
 
-from typing import Literal
+from typing import Iterable, Literal, Optional, Sequence
 from functools import cache
-import csv
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+import tables
+from profiling import count, stage
+from result_cache import code_version
+from tables import (
+    CATEGORICAL_COLUMNS,
+    describe_sources,
+    read_chunks,
+    read_mapped,
+    resolve_table,
+    write_mapped,
+)
+
 
 # CFEIntact defect codes categorized by what they depend on:
 STRUCTURAL_DEFECTS = {
@@ -39,100 +53,225 @@ OTHER_DEFECTS = {
 }
 
 
-def get_errors(ret: dict[str, list[dict]], path: Path) -> None:
-    with open(path) as f:
-        r = csv.DictReader(f)
-        for row in r:
-            qseqid = row["qseqid"]
-            if qseqid not in ret:
-                ret[qseqid] = []
-            ret[qseqid].append(row)
+# Every known CFEIntact defect code gets one bit in a per-sequence mask.
+DEFECT_CODES = sorted(
+    STRUCTURAL_DEFECTS | DISTANCE_DEFECTS | INDEL_DEFECTS | OTHER_DEFECTS
+)
+DEFECT_BITS = {code: 1 << i for i, code in enumerate(DEFECT_CODES)}
+
+# Codes that CFEIntact reports but that are not listed above.
+UNKNOWN_DEFECT_BIT = 1 << len(DEFECT_CODES)
+
+
+def defects_mask(codes: Iterable[str]) -> int:
+    mask = 0
+    for code in codes:
+        mask |= DEFECT_BITS.get(code, UNKNOWN_DEFECT_BIT)
+    return mask
+
+
+STRUCTURAL_DEFECTS_MASK = defects_mask(STRUCTURAL_DEFECTS)
+DISTANCE_DEFECTS_MASK = defects_mask(DISTANCE_DEFECTS)
+INDEL_DEFECTS_MASK = defects_mask(INDEL_DEFECTS)
+OTHER_DEFECTS_MASK = defects_mask(OTHER_DEFECTS)
+
+# Intactness columns added to every table, and the defects each one excludes.
+# A new filtering level only needs a new entry here.
+INTACTNESS_LEVELS = {
+    "size_structural_intact": STRUCTURAL_DEFECTS_MASK,
+    "distance_intact": DISTANCE_DEFECTS_MASK,
+    "indel_intact": INDEL_DEFECTS_MASK,
+}
 
 
 @cache
-def errors(path: Path) -> dict[str, list[dict]]:
-    ret: dict[str, list[dict]] = {}
-    get_errors(ret=ret, path=path)
-    return ret
+def compile_defects(path: Path) -> pd.Series:
+    """Read defects.csv into one defects bitmask per qseqid."""
+    defects = pd.read_csv(path, usecols=["qseqid", "code"], dtype=str)
+    bits = defects["code"].map(DEFECT_BITS).fillna(UNKNOWN_DEFECT_BIT).astype(np.uint64)
+    # Each bit is a distinct power of two, so OR-ing the distinct bits of a
+    # sequence is the same as summing them.
+    pairs = pd.DataFrame({"qseqid": defects["qseqid"], "bit": bits}).drop_duplicates()
+    return pairs.groupby("qseqid", sort=False)["bit"].sum().astype(np.uint64)
+
+
+def get_defects(qseqids: pd.Series, path: Path) -> np.ndarray:
+    """Defects bitmask for each of the categorical `qseqids`, zero if none or missing."""
+    masks = compile_defects(path)
+    per_category = masks.reindex(qseqids.cat.categories, fill_value=0).to_numpy(dtype=np.uint64)
+    codes = qseqids.cat.codes.to_numpy()
+    # A missing qseqid has code -1, which would index the last category.
+    present = codes >= 0
+    defects = np.zeros(len(codes), dtype=np.uint64)
+    defects[present] = per_category[codes[present]]
+    return defects
+
+
+def is_intact(defects: np.ndarray, mask: int) -> np.ndarray:
+    return (defects & np.uint64(mask)) == 0
 
 
 def is_structurally_intact(qseqid: str, path: Path) -> bool:
     """Check only structural defects (for size analysis)."""
-    errs = errors(path).get(qseqid)
-    if errs is None:
-        return True
-    codes = [err["code"] for err in errs]
-    return not any(code in STRUCTURAL_DEFECTS for code in codes)
+    return not int(compile_defects(path).get(qseqid, 0)) & STRUCTURAL_DEFECTS_MASK
 
 
 def is_distance_intact(qseqid: str, path: Path) -> bool:
     """Check structural + size defects (for distance analysis)."""
-    errs = errors(path).get(qseqid)
-    if errs is None:
-        return True
-    codes = [err["code"] for err in errs]
-    return not any(code in DISTANCE_DEFECTS for code in codes)
+    return not int(compile_defects(path).get(qseqid, 0)) & DISTANCE_DEFECTS_MASK
 
 
 def is_indel_intact(qseqid: str, path: Path) -> bool:
     """Check all CFEIntact defects (for indel analysis)."""
-    errs = errors(path).get(qseqid)
-    if errs is None:
-        return True
-    codes = [err["code"] for err in errs]
-    return not any(code in INDEL_DEFECTS for code in codes)
+    return not int(compile_defects(path).get(qseqid, 0)) & INDEL_DEFECTS_MASK
+
+
+SOURCES = {
+    "los-alamos/plasma": ("output/individual-plasma/joined.csv", None),
+    "cfeintact/plasma": (
+        "output/fullgenomes-plasma/regions.csv",
+        "output/fullgenomes-plasma/defects.csv",
+    ),
+    "cfeintact/all": (
+        "output/fullgenomes-all/regions.csv",
+        "output/fullgenomes-all/defects.csv",
+    ),
+}
+
+# Long aminoacid strings are only ever used through these summaries, so they
+# are reduced while reading and never kept in memory as a whole.
+SEQUENCE_COLUMNS = ["protein", "aminoacids"]
+
+
+def get_source_paths(
+    source: Literal["los-alamos/plasma", "cfeintact/plasma", "cfeintact/all"],
+) -> tuple[Path, Optional[Path]]:
+    try:
+        path, defects_path = SOURCES[source]
+    except KeyError:
+        raise ValueError(f"Invalid choice for source: {source!r}.") from None
+
+    return Path(path), (None if defects_path is None else Path(defects_path))
+
+
+def summarize_sequences(chunk: pd.DataFrame) -> pd.DataFrame:
+    for column in SEQUENCE_COLUMNS:
+        if column in chunk:
+            chunk[f"{column}_length"] = chunk[column].str.len().astype("int32")
+
+    if "aminoacids" in chunk:
+        has_stop = chunk["aminoacids"].str[10:-10].str.contains("*", regex=False)
+        chunk["has_internal_stop"] = has_stop.astype(bool)
 
+    return chunk.drop(columns=[c for c in SEQUENCE_COLUMNS if c in chunk])
 
-def get_joined_it(
+
+def read_table(
+    path: Path, columns: Optional[Sequence[str]] = None, chunksize: int = 100_000
+) -> pd.DataFrame:
+    """Read a CSV or Parquet table, restricted to `columns` if given."""
+    chunks = [summarize_sequences(chunk) for chunk in read_chunks(path, columns, chunksize)]
+    table = pd.concat(chunks, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in table:
+            values = table[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Parquet keeps the categories in order of appearance.
+                values = values.astype(values.cat.categories.dtype)
+            table[column] = values.astype("category")
+    return table
+
+
+def load_joined(
     source: Literal["los-alamos/plasma", "cfeintact/plasma", "cfeintact/all"],
-):
-    if source == "los-alamos/plasma":
-        path = "output/individual-plasma/joined.csv"
-        defects_path = None
-    elif source == "cfeintact/plasma":
-        path = "output/fullgenomes-plasma/regions.csv"
-        defects_path = Path("output/fullgenomes-plasma/defects.csv")
-    elif source == "cfeintact/all":
-        path = "output/fullgenomes-all/regions.csv"
-        defects_path = Path("output/fullgenomes-all/defects.csv")
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """Load a source as a typed, column-oriented table.
+
+    The `protein` and `aminoacids` strings are replaced by their lengths,
+    `protein_length` and `aminoacids_length`. Intactness is added as one
+    boolean column per entry of `INTACTNESS_LEVELS`. CFEIntact sources also
+    get a `defects` column with the bitmask of their defect codes.
+
+    If `columns` is given, only those columns of the source file, plus the
+    ones that intactness is computed from, are read. The source is read from
+    its Parquet version when there is an up to date one.
+    """
+    path, defects_path = get_source_paths(source)
+    with stage("read_table") as timed:
+        table = read_table(resolve_table(path), needed_columns(columns, defects_path))
+        timed.records = len(table)
+    with stage("add_intactness", len(table)):
+        return add_intactness(table, defects_path)
+
+
+def needed_columns(columns: Optional[Sequence[str]], defects_path: Optional[Path]) -> Optional[list[str]]:
+    """`columns` and those that intactness is computed from."""
+    if columns is None:
+        return None
+    needed = ["aminoacids"] if defects_path is None else ["qseqid"]
+    return list(dict.fromkeys([*columns, *needed]))
+
+
+def add_intactness(table: pd.DataFrame, defects_path: Optional[Path]) -> pd.DataFrame:
+    if defects_path is None:
+        intact = ~table["has_internal_stop"].to_numpy()
+        for column in INTACTNESS_LEVELS:
+            table[column] = intact
     else:
-        raise ValueError(f"Invalid choice for source: {source!r}.")
+        defects = get_defects(table["qseqid"].astype("category"), defects_path)
+        table["defects"] = defects
+        for column, mask in INTACTNESS_LEVELS.items():
+            table[column] = is_intact(defects, mask)
 
-    with open(path, "r") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            row["distance"] = float(row["distance"])
-            row["start"] = int(row["start"])
-            row["end"] = int(row["end"])
+    return table
 
-            key = row["qseqid"]
 
-            if defects_path is None:
-                aminos = row["aminoacids"]
-                has_stop = "*" in aminos[10:-10]
-                row["size_structural_intact"] = not has_stop
-                row["distance_intact"] = not has_stop
-                row["indel_intact"] = not has_stop
-            else:
-                row["size_structural_intact"] = is_structurally_intact(
-                    key, defects_path
-                )
-                row["distance_intact"] = is_distance_intact(key, defects_path)
-                row["indel_intact"] = is_indel_intact(key, defects_path)
+# Loaded tables are kept here as memory-mapped Arrow files, shared by every
+# kernel and script that loads the same source. None disables it.
+JOINED_CACHE_DIR: Optional[Path] = Path(__file__).resolve().parent.parent / "cache" / "joined"
 
-            yield row
+
+def mapped_table_path(source: str, columns: Optional[tuple[str, ...]]) -> Path:
+    assert JOINED_CACHE_DIR is not None
+    name = source.replace("/", "-")
+    if columns is not None:
+        name += "-" + "-".join(columns)
+    return JOINED_CACHE_DIR / f"{name}.arrow"
 
 
 @cache
 def get_joined(
     source: Literal["los-alamos/plasma", "cfeintact/all", "cfeintact/plasma"],
-):
+    columns: Optional[tuple[str, ...]] = None,
+) -> pd.DataFrame:
     """Get cached joined data for a source.
 
+    Besides being cached in this process, the table is kept in a memory-mapped
+    file in `JOINED_CACHE_DIR`. It is reused until one of the source files or
+    the loading code changes.
+
     Args:
         source: Data source identifier
+        columns: Source columns to read, all of them if None
 
     Returns:
-        List of sequence dictionaries with intactness annotations
+        Table of sequences with intactness annotations, see `load_joined`
     """
-    return list(get_joined_it(source))
+    if JOINED_CACHE_DIR is None:
+        return load_joined(source, columns)
+
+    path, defects_path = get_source_paths(source)
+    paths = [resolve_table(path)] + ([] if defects_path is None else [defects_path])
+    key = code_version([__file__, tables.__file__])
+    mapped_path = mapped_table_path(source, columns)
+
+    with stage("read_mapped"):
+        table = read_mapped(mapped_path, key, paths)
+    count("joined cache", hits=int(table is not None), misses=int(table is None))
+    if table is None:
+        sources = describe_sources(paths)
+        table = load_joined(source, columns)
+        with stage("write_mapped", len(table)):
+            write_mapped(table, mapped_path, key, sources)
+    return table
@@ -1,26 +1,54 @@
+import argparse
+from typing import Optional
 
+import profiling
+from bootstrap import Bootstrap, make_executor
 from mynotebook import get_joined, show_all_orfs
 
 # import matplotlib as mpl
 # mpl.use("Agg")  # Use a backend that does not support on-screen
 
-joined = get_joined("cfeintact/plasma")
 
-#
-# Size cutoffs are determined manually.
-#
+def print_results(bootstrap: Optional[Bootstrap] = None):
+    # Only the columns of the reported metrics; the aminoacid strings are not needed.
+    joined = get_joined("cfeintact/plasma", columns=("region", "distance", "indel_impact"))
 
-# print("###########")
-# print("## Sizes ##")
-# print("###########")
-# show_all_orfs(joined, "CFEIntact", "intact", "size", 0.01)
+    #
+    # Size cutoffs are determined manually.
+    #
 
-print("###############")
-print("## Distances ##")
-print("###############")
-show_all_orfs(joined, "CFEIntact", "intact", "distance", 0.0001)
+    # print("###########")
+    # print("## Sizes ##")
+    # print("###########")
+    # show_all_orfs(joined, "CFEIntact", "intact", "size", 0.01)
 
-print("##################")
-print("## Indel impact ##")
-print("##################")
-show_all_orfs(joined, "CFEIntact", "intact", "indel impact", 0.0001)
+    print("###############")
+    print("## Distances ##")
+    print("###############")
+    show_all_orfs(joined, "CFEIntact", "intact", "distance", 0.0001, bootstrap=bootstrap)
+
+    print("##################")
+    print("## Indel impact ##")
+    print("##################")
+    show_all_orfs(joined, "CFEIntact", "intact", "indel impact", 0.0001, bootstrap=bootstrap)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the distributions of the metrics of intact CFEIntact ORFs.")
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="RESAMPLES", help="Report 95%% confidence intervals of the cutoffs, means and medians from this many resamples (default: 0, none)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the resampling (default: 0)")
+    parser.add_argument("--jobs", type=int, default=None, help="Processes drawing resamples (default: one per CPU)")
+    parser.add_argument("--profile", metavar="DIRECTORY", default=None, help=f"Write a Chrome trace of the time spent in each stage to this directory, as does setting ${profiling.ENVIRONMENT_VARIABLE}")
+    args = parser.parse_args(argv)
+    profiling.enable(args.profile)
+
+    executor = make_executor(args.jobs) if args.bootstrap else None
+    bootstrap = Bootstrap(args.bootstrap, seed=args.seed, executor=executor) if args.bootstrap else None
+    print_results(bootstrap)
+
+    if executor is not None:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
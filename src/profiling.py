@@ -0,0 +1,198 @@
+"""Opt-in timings of the stages of the analysis, written as Chrome traces.
+
+Profiling is enabled by setting `HIVSTATS_PROFILE` to a directory, or by the
+`--profile DIRECTORY` option of the scripts that have one. Every run then
+writes `<DIRECTORY>/<script>-<pid>.json`, which chrome://tracing and
+https://ui.perfetto.dev open, and prints a summary of its stages.
+
+Each stage records its wall and CPU time, the number of records it handled
+and the peak resident set size of its process so far. Counters, such as
+cache hits, are recorded with `count`. Processes of a pool that a profiled
+run starts inherit the setting; their events end up in the trace of the run.
+
+When profiling is disabled, `stage` returns one shared object that does
+nothing, so instrumented code costs a global lookup and a call per stage.
+"""
+
+import atexit
+import glob
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Optional
+
+
+ENVIRONMENT_VARIABLE = "HIVSTATS_PROFILE"
+# Name of the trace of the run, which worker processes inherit.
+RUN_VARIABLE = "HIVSTATS_PROFILE_RUN"
+
+directory: Optional[str] = None
+run: Optional[str] = None
+# Whether this process started the run, and writes its trace.
+owner = False
+events: list[dict] = []
+counters: dict[str, dict[str, float]] = {}
+# Process that the events are written for at exit, see `record`.
+registered_pid: Optional[int] = None
+
+
+class Disabled:
+    records = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+DISABLED = Disabled()
+
+
+class Stage:
+    """Times the code in its `with` block. `records` can be set inside the block."""
+
+    def __init__(self, name: str, records: Optional[int]):
+        self.name = name
+        self.records = records
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        self.cpu = time.process_time_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter_ns() - self.start
+        args = {
+            "cpu_ms": (time.process_time_ns() - self.cpu) / 1e6,
+            "peak_rss_mib": peak_rss_mib(),
+        }
+        if self.records is not None:
+            args["records"] = self.records
+            args["records_per_second"] = self.records / (duration / 1e9) if duration else None
+        record({"name": self.name, "ph": "X", "ts": self.start / 1e3, "dur": duration / 1e3, "args": args})
+        return False
+
+
+def stage(name: str, records: Optional[int] = None):
+    """A context manager that records the time spent in its block as `name`."""
+    return DISABLED if directory is None else Stage(name, records)
+
+
+def count(name: str, **increments: float) -> None:
+    """Add `increments` to the values of the counter `name`, e.g. `count("cache", hits=1)`."""
+    if directory is not None:
+        values = counters.setdefault(name, {})
+        for key, increment in increments.items():
+            values[key] = values.get(key, 0) + increment
+        record({"name": name, "ph": "C", "ts": time.perf_counter_ns() / 1e3, "args": dict(values)})
+
+
+def peak_rss_mib() -> float:
+    # Linux reports kilobytes.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def record(event: dict) -> None:
+    global registered_pid
+    pid = os.getpid()
+    if registered_pid != pid:
+        # A worker process: it writes its events to a part file when it
+        # exits, which the owner merges into the trace. Pool workers leave
+        # through `multiprocessing`, which skips `atexit`.
+        import multiprocessing.util
+
+        registered_pid = pid
+        multiprocessing.util.Finalize(None, write_part, exitpriority=10)
+    event["pid"] = pid
+    event["tid"] = threading.get_native_id()
+    events.append(event)
+
+
+def trace_path() -> str:
+    assert directory is not None and run is not None
+    return os.path.join(directory, f"{run}.json")
+
+
+def write_part() -> None:
+    if events:
+        with open(f"{trace_path()}.{os.getpid()}.part", "w") as f:
+            json.dump(events, f)
+        events.clear()
+
+
+def summarize(all_events: list[dict], file=sys.stderr) -> None:
+    totals: dict[str, list[float]] = {}
+    for event in all_events:
+        if event["ph"] == "X":
+            total = totals.setdefault(event["name"], [0, 0.0, 0.0, 0])
+            total[0] += 1
+            total[1] += event["dur"] / 1e6
+            total[2] += event["args"]["cpu_ms"] / 1e3
+            total[3] += event["args"].get("records", 0)
+    peak = max((event["args"]["peak_rss_mib"] for event in all_events if "peak_rss_mib" in event["args"]), default=0)
+
+    print(f"Profile of {run}, peak RSS {peak:.0f} MiB:", file=file)
+    print(f"  {'stage':<24} {'calls':>7} {'wall s':>9} {'CPU s':>9} {'records/s':>11}", file=file)
+    for name, (calls, wall, cpu, records) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        rate = f"{records / wall:.0f}" if records and wall else "-"
+        print(f"  {name:<24} {calls:>7} {wall:>9.3f} {cpu:>9.3f} {rate:>11}", file=file)
+
+
+def finish() -> None:
+    """Write the trace of the run, with the events of its worker processes."""
+    global owner
+    if not owner or os.getpid() != registered_pid:
+        return
+    owner = False
+
+    all_events = list(events)
+    for part in sorted(glob.glob(f"{glob.escape(trace_path())}.*.part")):
+        with open(part) as f:
+            all_events.extend(json.load(f))
+        os.remove(part)
+    all_events.append({"name": "peak RSS (MiB)", "ph": "C", "ts": time.perf_counter_ns() / 1e3,
+                       "pid": os.getpid(), "tid": threading.get_native_id(), "args": {"main": peak_rss_mib()}})
+    all_events.append({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": run}})
+
+    with open(trace_path(), "w") as f:
+        json.dump({"traceEvents": all_events, "displayTimeUnit": "ms"}, f)
+    summarize(all_events)
+    print(f"Profile written to '{trace_path()}'.", file=sys.stderr)
+
+
+def enable(path: Optional[str]) -> None:
+    """Profile this run into the directory `path`, or do nothing if it is None."""
+    global directory, run, owner, registered_pid
+    if path is None or owner:
+        return
+    os.makedirs(path, exist_ok=True)
+    directory = os.path.abspath(path)
+    run = f"{os.path.basename(sys.argv[0]) or 'python'}-{os.getpid()}"
+    owner = True
+    registered_pid = os.getpid()
+    # Inherited by the worker processes of this run.
+    os.environ[ENVIRONMENT_VARIABLE] = directory
+    os.environ[RUN_VARIABLE] = run
+    atexit.register(finish)
+
+
+def forget_parent() -> None:
+    global owner
+    # A forked child keeps a copy of the events of its parent.
+    owner = False
+    events.clear()
+    counters.clear()
+
+
+if os.environ.get(ENVIRONMENT_VARIABLE):
+    if os.environ.get(RUN_VARIABLE):
+        directory = os.environ[ENVIRONMENT_VARIABLE]
+        run = os.environ[RUN_VARIABLE]
+    else:
+        enable(os.environ[ENVIRONMENT_VARIABLE])
+
+os.register_at_fork(after_in_child=forget_parent)
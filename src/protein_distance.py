@@ -0,0 +1,394 @@
+"""Alignment-based distance between an aminoacid sequence and a reference protein.
+
+Shared by `make-individual-plasma-csv` and the notebook so that both compute
+the distance with exactly the same scoring parameters.
+"""
+
+import sys
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from Bio import Align
+
+
+MATCH_SCORE = 2
+MISMATCH_SCORE = -1
+OPEN_GAP_SCORE = -1.5
+EXTEND_GAP_SCORE = -0.2
+
+# Every score above is a multiple of 0.1. The score bounds and the banded
+# alignment below work in tenths, so that they can use integers. Distances
+# of aligned proteins still come from the unscaled `aligner.align(...).score`,
+# as they always have: the same optimum computed in another order can be off
+# in its last bits, which the scaled score is on 785 of the 1045 vpu and 269
+# of the 1089 nef records, and even `aligner.score(...)` is on 5 nef records
+# (see `src/test-aligner-distance.py`).
+SCORE_SCALE = 10
+
+SCORING_PARAMETERS = (MATCH_SCORE, MISMATCH_SCORE, OPEN_GAP_SCORE, EXTEND_GAP_SCORE, SCORE_SCALE)
+
+# The same scores in units of 1 / SCORE_SCALE, for the computations below.
+SCALED_MATCH = round(MATCH_SCORE * SCORE_SCALE)
+SCALED_MISMATCH = round(MISMATCH_SCORE * SCORE_SCALE)
+SCALED_OPEN_GAP = round(OPEN_GAP_SCORE * SCORE_SCALE)
+SCALED_EXTEND_GAP = round(EXTEND_GAP_SCORE * SCORE_SCALE)
+
+
+def make_aligner(scale: int = 1) -> Align.PairwiseAligner:
+    aligner = Align.PairwiseAligner()
+    aligner.mode = "global"
+    aligner.match_score = MATCH_SCORE * scale
+    aligner.mismatch_score = MISMATCH_SCORE * scale
+    aligner.open_gap_score = OPEN_GAP_SCORE * scale
+    aligner.extend_gap_score = EXTEND_GAP_SCORE * scale
+    return aligner
+
+
+def make_scorer() -> Align.PairwiseAligner:
+    """Aligner used for score-only computations, scaled by `SCORE_SCALE`."""
+    return make_aligner(SCORE_SCALE)
+
+
+aligner = make_aligner()
+scorer = make_scorer()
+
+
+def alignment_score(query: str, reference: str, scorer: Align.PairwiseAligner = scorer) -> float:
+    """Optimal global alignment score, without building the alignment itself."""
+    return scorer.score(query, reference) / SCORE_SCALE
+
+
+def aligner_distance(query: str, reference: str, aligner: Align.PairwiseAligner = aligner) -> float:
+    if len(query) == 0:
+        return float("inf")
+
+    score = aligner.align(query, reference).score
+    return MATCH_SCORE - score / len(query)
+
+
+def score_distance(scaled_score: int, length: int) -> float:
+    """`aligner_distance` for a score in units of 1 / `SCORE_SCALE`, up to rounding."""
+    return MATCH_SCORE - scaled_score / SCORE_SCALE / length
+
+
+def gap_score(length: int, gaps: int = 1) -> int:
+    """Best scaled score of `length` gapped positions in `gaps` gaps, or 0 without any."""
+    if length == 0:
+        return 0
+    return gaps * SCALED_OPEN_GAP + (length - gaps) * SCALED_EXTEND_GAP
+
+
+def score_bounds(query: str, reference: str) -> tuple[int, int]:
+    """Lower and upper bound of the optimal scaled score of `query` against `reference`.
+
+    The lower bound is the score of the best global alignment with at most
+    one gap, which is an actual alignment. The upper bound comes from the
+    letter composition: no alignment has more matches than the two sequences
+    share letters, and every residue left over is either a mismatch or in a
+    gap. Both take linear time, and they are equal for the common case of a
+    protein that differs from the reference by substitutions only.
+    """
+    match, mismatch = SCALED_MATCH, SCALED_MISMATCH
+    q = np.frombuffer(query.encode(), dtype=np.uint8)
+    r = np.frombuffer(reference.encode(), dtype=np.uint8)
+    n, m = len(q), len(r)
+    k = min(n, m)
+    overhang = abs(n - m)
+    shorter, longer = (q, r) if n <= m else (r, q)
+
+    # Align the first i residues of the shorter sequence to the start of the
+    # longer one and the rest to its end, with the overhang as a gap in between.
+    head = np.where(shorter == longer[:k], match, mismatch)
+    tail = np.where(shorter == longer[overhang:], match, mismatch)
+    splits = np.concatenate([[0], np.cumsum(head)]) + np.concatenate([np.cumsum(tail[::-1])[::-1], [0]])
+    lower = int(splits.max()) + gap_score(overhang)
+
+    shared = int(np.minimum(np.bincount(q, minlength=256), np.bincount(r, minlength=256)).sum())
+    if shared == k:
+        upper = match * k + gap_score(overhang)
+    else:
+        # Either the unmatched residues of both sequences are all in gaps,
+        # which takes at least one gap in each of them, or all residues of
+        # the shorter one are aligned and the rest of them are mismatches.
+        upper = max(match * shared + gap_score(n + m - 2 * shared, 2),
+                    match * shared + mismatch * (k - shared) + gap_score(overhang))
+    return lower, upper
+
+
+# Queries aligned by `banded_scores` at once, and the fewest worth its
+# overhead per row. Against references shorter than `MIN_BANDED_REFERENCE`,
+# the unbanded aligner is about as fast anyway.
+BANDED_BATCH = 64
+MIN_BANDED_BATCH = 8
+MIN_BANDED_REFERENCE = 512
+
+# Scaled score below every reachable one, far enough from the int32 limit
+# that adding scores to it never wraps around.
+UNREACHABLE = np.int32(-(1 << 29))
+
+
+def required_band(score: int, n: int, m: int) -> int:
+    """Smallest band that holds every alignment scoring at least `score`.
+
+    The band of an alignment of sequences of lengths `n` and `m` is the
+    number of diagonals it may stray beyond the ones between the start and
+    the end. With `a` matches, `b` mismatches and `g` gapped positions in
+    `k` gaps, `n + m == 2a + 2b + g`, so the optimal score falls short of
+    `n + m` half-matches by `(match - mismatch) b + (match / 2 - extend) g
+    - (open - extend) k`, where every term is non-negative. An alignment
+    that leaves a band of `w` goes both ways, so it has two or more gaps
+    and `|n - m| + 2w + 2` or more gapped positions, which bounds that
+    shortfall from below.
+    """
+    # Twice the shortfall, to stay integral.
+    shortfall = SCALED_MATCH * (n + m) - 2 * score
+    per_position = SCALED_MATCH - 2 * SCALED_EXTEND_GAP
+    per_gap = 2 * (SCALED_EXTEND_GAP - SCALED_OPEN_GAP)
+    # The smallest `w` with per_position * (|n - m| + 2w + 2) + 2 * per_gap >= shortfall.
+    needed = -(-(shortfall - 2 * per_gap) // per_position) - abs(n - m) - 2
+    return max(0, -(-needed // 2))
+
+
+def banded_scores(queries: Sequence[str], reference: str, bands: Sequence[int]) -> list[int]:
+    """Optimal scaled scores of non-empty `queries` among alignments within their `bands` of diagonals.
+
+    This is the dynamic programming of the aligner with affine gaps, for all
+    queries at once, one row of the matrix after the other. Each query gets
+    the diagonals from the start to the end of its alignment plus its band
+    on either side, so rows hold only as many cells as the widest of them.
+    """
+    r = np.frombuffer(reference.encode(), dtype=np.uint8)
+    m = len(r)
+    lengths = np.array([len(query) for query in queries], dtype=np.int64)
+    bands = np.asarray(bands, dtype=np.int64)
+    count, rows = len(queries), int(lengths.max())
+
+    padded = np.zeros((rows, count), dtype=np.uint8)
+    for i, query in enumerate(queries):
+        padded[:len(query), i] = np.frombuffer(query.encode(), dtype=np.uint8)
+
+    # Cell t of row i of a query is at column i + first[query] + t.
+    first = np.minimum(0, m - lengths) - bands
+    width = int((np.abs(m - lengths) + 2 * bands).max()) + 1
+    columns = first[:, None] + np.arange(width)
+    extend_columns = (SCALED_EXTEND_GAP * columns).astype(np.int32)
+    ends = m - lengths - first
+    lowest = int(first.min())
+
+    # The score of each letter against each column of the reference, with
+    # room on both sides for cells outside of it. Row i of a query looks up
+    # the window of its letter at offset[query] + i.
+    before = 1 - lowest
+    profile = np.full((256, before + m + rows + width), SCALED_MISMATCH, dtype=np.int32)
+    profile[r, before + np.arange(m)] = SCALED_MATCH
+    windows = sliding_window_view(profile, width, axis=1)
+    offset = first + before - 1
+
+    def horizontal(best_without: np.ndarray, out: np.ndarray) -> None:
+        """Best scores ending in a gap in the query, from those ending otherwise in the same row."""
+        # best over k < j of best_without[k] + open + (j - 1 - k) extend
+        np.subtract(best_without, extend_columns, out=prefix)
+        np.maximum.accumulate(prefix, axis=1, out=prefix)
+        out[:, 0] = UNREACHABLE
+        np.add(prefix[:, :-1], extend_columns[:, 1:], out=out[:, 1:])
+        out[:, 1:] += SCALED_OPEN_GAP - SCALED_EXTEND_GAP
+
+    prefix = np.empty((count, width), dtype=np.int32)
+    diagonal = np.where(columns == 0, 0, UNREACHABLE).astype(np.int32)
+    vertical = np.full((count, width), UNREACHABLE, dtype=np.int32)
+    horizontal_gap = np.empty_like(vertical)
+    horizontal(diagonal, horizontal_gap)
+    horizontal_gap[columns < 1] = UNREACHABLE
+    best = np.maximum(diagonal, horizontal_gap)
+    new_diagonal = np.empty_like(vertical)
+    new_vertical = np.empty_like(vertical)
+    opened = np.empty_like(vertical)
+
+    scores = np.empty(count, dtype=np.int64)
+    for i in range(1, rows + 1):
+        np.add(best, windows[padded[i - 1], offset + i], out=new_diagonal)
+        np.maximum(diagonal, horizontal_gap, out=opened)
+        np.add(opened[:, 1:], SCALED_OPEN_GAP, out=opened[:, 1:])
+        np.add(vertical[:, 1:], SCALED_EXTEND_GAP, out=new_vertical[:, :-1])
+        np.maximum(new_vertical[:, :-1], opened[:, 1:], out=new_vertical[:, :-1])
+        new_vertical[:, -1] = UNREACHABLE
+        # Columns past the reference never feed back into its last column,
+        # so only those before its start need to be masked, in the first rows.
+        if i + lowest < 1:
+            new_diagonal[columns + i < 1] = UNREACHABLE
+            new_vertical[columns + i < 0] = UNREACHABLE
+        np.maximum(new_diagonal, new_vertical, out=best)
+        horizontal(best, horizontal_gap)
+        if i + lowest < 1:
+            horizontal_gap[columns + i < 1] = UNREACHABLE
+        np.maximum(best, horizontal_gap, out=best)
+        diagonal, new_diagonal = new_diagonal, diagonal
+        vertical, new_vertical = new_vertical, vertical
+
+        done = np.flatnonzero(lengths == i)
+        scores[done] = best[done, ends[done]]
+    return scores.tolist()
+
+
+def banded_alignment_scores(queries: Sequence[str], reference: str, initial_band: int = 16,
+                            scorer: Align.PairwiseAligner = scorer) -> list[int]:
+    """Optimal scaled scores of `queries` against `reference`, the same as `scorer.score`.
+
+    Each query first gets the band that `required_band` asks for the
+    best alignment with at most one gap, capped at `initial_band`. Where
+    that banded score does not rule out better alignments outside the
+    band, the query is aligned again in the band its banded score asks for,
+    which holds the optimal alignment. Rows of the banded alignment cost
+    about as much as a quarter of a row of `scorer`, plus a fixed overhead,
+    so short references, queries with wider bands, and too few queries of
+    similar width are left to `scorer` instead.
+    """
+    m = len(reference)
+    if m < MIN_BANDED_REFERENCE:
+        return [round(scorer.score(query, reference)) for query in queries]
+
+    scores: list[Optional[int]] = [None] * len(queries)
+    bands = {}
+    for i, query in enumerate(queries):
+        lower, upper = score_bounds(query, reference)
+        if lower == upper:
+            scores[i] = lower
+        else:
+            bands[i] = min(required_band(lower, len(query), m), initial_band)
+
+    def width(i: int) -> int:
+        return 2 * bands[i] + abs(len(queries[i]) - m) + 1
+
+    while bands:
+        # Queries of similar widths together, so that few cells are wasted.
+        narrow = sorted((i for i in bands if 4 * width(i) <= m), key=width)
+        batches = [narrow[start:start + BANDED_BATCH] for start in range(0, len(narrow), BANDED_BATCH)]
+        banded = {i for batch in batches if len(batch) >= MIN_BANDED_BATCH for i in batch}
+        for i in bands.keys() - banded:
+            scores[i] = round(scorer.score(queries[i], reference))
+
+        retry = {}
+        for batch in batches:
+            if len(batch) < MIN_BANDED_BATCH:
+                continue
+            for i, score in zip(batch, banded_scores([queries[i] for i in batch], reference,
+                                                     [bands[i] for i in batch])):
+                needed = required_band(score, len(queries[i]), m)
+                if needed <= bands[i]:
+                    scores[i] = score
+                else:
+                    retry[i] = needed
+        bands = retry
+    return scores
+
+
+def banded_distances(queries: Sequence[str], reference: str, scorer: Align.PairwiseAligner = scorer) -> list[float]:
+    """`aligner_distance` of each of `queries`, up to rounding, by `banded_alignment_scores`."""
+    nonempty = [query for query in queries if query]
+    scores = iter(banded_alignment_scores(nonempty, reference, scorer=scorer))
+    return [score_distance(next(scores), len(query)) if query else float("inf") for query in queries]
+
+
+class FastPath:
+    """Distances from `score_bounds`, aligning only where they could be near a threshold.
+
+    A protein whose distance bounds do not enclose any of `thresholds` is
+    on the same side of each of them whatever its exact distance is, so it
+    gets the distance of the lower score bound instead, which is at most
+    the exact one plus the width of the bounds. The others are aligned.
+    Which distances are estimates is returned with them, so that they can
+    be told apart from exact ones downstream.
+    Counts and errors are kept so that runs can report on them and add up
+    the counts of worker processes.
+    """
+
+    def __init__(self, thresholds: Sequence[float]):
+        self.thresholds = tuple(sorted(thresholds))
+        self.estimated = 0
+        self.aligned = 0
+        # Of the estimated proteins, the widest bounds on the error.
+        self.max_bound = 0.0
+        # Of the aligned proteins, the largest difference between the
+        # estimate and the exact distance.
+        self.max_error = 0.0
+
+    def fresh(self) -> "FastPath":
+        return FastPath(self.thresholds)
+
+    def add(self, other: "FastPath") -> None:
+        self.estimated += other.estimated
+        self.aligned += other.aligned
+        self.max_bound = max(self.max_bound, other.max_bound)
+        self.max_error = max(self.max_error, other.max_error)
+
+    def distances(self, queries: Sequence[str], reference: str,
+                  align: Callable[[list[str]], list[float]]) -> tuple[list[float], list[bool]]:
+        """Distances of `queries`, of which `align` computes those that need to be exact, and which are estimated."""
+        ret: list[float] = []
+        estimated: list[bool] = []
+        estimates = {}
+        for i, query in enumerate(queries):
+            if len(query) == 0:
+                ret.append(float("inf"))
+                estimated.append(False)
+                continue
+
+            lower, upper = score_bounds(query, reference)
+            estimate = score_distance(lower, len(query))
+            lowest = score_distance(upper, len(query))
+            if any(lowest <= threshold <= estimate for threshold in self.thresholds):
+                estimates[i] = estimate
+            else:
+                self.estimated += 1
+                self.max_bound = max(self.max_bound, estimate - lowest)
+            ret.append(estimate)
+            estimated.append(i not in estimates)
+
+        exact = align([queries[i] for i in estimates])
+        for (i, estimate), distance in zip(estimates.items(), exact):
+            self.aligned += 1
+            self.max_error = max(self.max_error, estimate - distance)
+            ret[i] = distance
+        return ret, estimated
+
+    def report(self, file=sys.stderr) -> None:
+        total = self.estimated + self.aligned
+        rate = self.estimated / total if total else 0
+        print(
+            f"Fast path: {self.estimated} proteins estimated, {self.aligned} aligned "
+            f"({rate:.1%} estimated), estimates off by at most {self.max_bound:.6g}; "
+            f"largest error of the estimate among aligned proteins {self.max_error:.6g}.",
+            file=file,
+        )
+
+
+def aligner_distances(
+    queries: Iterable[str], reference: str, aligner: Align.PairwiseAligner = aligner,
+    fast_path: Optional[FastPath] = None, banded: bool = False,
+    scorer: Align.PairwiseAligner = scorer,
+) -> tuple[list[float], list[bool]]:
+    """Distances of many queries to one fixed reference, and whether each is estimated.
+
+    Identical queries are scored only once, by `aligner_distance`. With a
+    `fast_path`, queries whose distance is clear of its thresholds are
+    estimated instead of aligned. With `banded`, the others are aligned by
+    `banded_distances` and `scorer`, which gives the same distances up to
+    floating point rounding.
+    """
+    queries = list(queries)
+    unique = list(dict.fromkeys(queries))
+
+    def align(queries: list[str]) -> list[float]:
+        if banded:
+            return banded_distances(queries, reference, scorer)
+        return [aligner_distance(query, reference, aligner) for query in queries]
+
+    if fast_path is None:
+        distances = align(unique)
+        estimated = [False] * len(unique)
+    else:
+        distances, estimated = fast_path.distances(unique, reference, align)
+    known = dict(zip(unique, zip(distances, estimated)))
+    results = [known[query] for query in queries]
+    return [distance for distance, _ in results], [is_estimated for _, is_estimated in results]
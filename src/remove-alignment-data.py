@@ -1,60 +1,76 @@
 #! /usr/bin/env python3
 
 import argparse
+import gzip
 import sys
 
 
-def remove_dashes(input_seq):
-    return input_seq.replace("-", "")
+def open_fasta(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
 
 
-def format_fasta_output(header, sequence, line_width):
-    formatted_sequence = "\n".join([sequence[i:i+line_width] for i in range(0, len(sequence), line_width)])
-    return f">{header}\n{formatted_sequence}"
+def remove_dashes(chunk):
+    return chunk.translate(None, b"-")
 
 
-def infer_line_width(first_line):
-    # Infer the line width from the length of the first line in the sequence
-    return len(first_line)
+class RecordWriter:
+    """Writes one sequence, re-wrapped to `line_width`, as its chunks arrive."""
+
+    def __init__(self, output, header, line_width):
+        self.output = output
+        self.line_width = line_width
+        self.pending = bytearray()
+        self.written = 0
+        output.write(b">" + header + b"\n")
+
+    def write(self, chunk):
+        self.pending += remove_dashes(chunk)
+        width = self.line_width
+        full = len(self.pending) - len(self.pending) % width
+        for i in range(0, full, width):
+            self.output.write(self.pending[i:i + width] + b"\n")
+        self.written += full
+        del self.pending[:full]
+
+    def close(self):
+        if self.pending or not self.written:
+            self.output.write(bytes(self.pending) + b"\n")
+        self.pending.clear()
 
 
 def process_fasta_file(input_file, output_file, line_width):
-    with open(input_file, "r") as f:
-        lines = f.readlines()
-
-    sequences = {}
-    line_widths = {}
-    current_header = ""
-    current_sequence = ""
-
-    for line in lines:
-        line = line.strip()
-        if line.startswith(">"):
-            if current_header:
-                sequences[current_header] = current_sequence
-                current_sequence = ""
-            current_header = line[1:]
-        else:
-            if current_header not in line_widths:
-                line_widths[current_header] = len(line)
-            current_sequence += line
-
-    if current_header and current_sequence:
-        sequences[current_header] = current_sequence
-
-    with open(output_file, "w") as f:
-        for header, sequence in sequences.items():
-            formatted_sequence = remove_dashes(sequence)
-            if line_width is None:
-                line_width_inferred = line_widths[header]
-            else:
-                line_width_inferred = line_width
-            formatted_output = format_fasta_output(header, formatted_sequence, line_width_inferred)
-            f.write(formatted_output + "\n")
+    with open_fasta(input_file, "rb") as f, open_fasta(output_file, "wb") as out:
+        header = None
+        record = None
+
+        def finish():
+            if record is not None:
+                record.close()
+            elif header is not None:
+                out.write(b">" + header + b"\n\n")
+
+        for line in f:
+            line = line.strip()
+            if line.startswith(b">"):
+                finish()
+                header = line[1:]
+                record = None
+            elif header is not None:
+                if record is None:
+                    if not line:
+                        continue
+                    # Infer the line width from the length of the first line in the sequence
+                    width = len(line) if line_width is None else line_width
+                    record = RecordWriter(out, header, width)
+                record.write(line)
+
+        finish()
 
 
 def main(argv) -> int:
-    parser = argparse.ArgumentParser(description="Process a FASTA file by removing '-' characters from sequences while maintaining line widths.")
+    parser = argparse.ArgumentParser(description="Process a FASTA file by removing '-' characters from sequences while maintaining line widths. Files ending in .gz are read and written gzip-compressed.")
     parser.add_argument("input_file", help="Path to the input FASTA file")
     parser.add_argument("output_file", help="Path to the output FASTA file")
     parser.add_argument("--line_width", type=int, default=None, help="Desired line width for the output sequences")
@@ -0,0 +1,128 @@
+"""On-disk, content-addressed cache of per-record results.
+
+Entries are keyed by a hash of everything the result depends on, so a cache
+file can be kept across `make reanalyze` runs: changed sequences, references,
+scoring parameters or code simply miss.
+"""
+
+import hashlib
+import sqlite3
+import sys
+from typing import Iterable, Sequence
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def code_version(paths: Iterable[str]) -> str:
+    """Hash of the source files that produce the cached values."""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed key/value store with least-recently-used eviction.
+
+    Values are tuples of `columns`. At most `max_entries` entries are kept;
+    when more are stored, the ones that were used least recently are dropped.
+    A file with other columns is emptied.
+    """
+
+    def __init__(self, path: str, columns: Sequence[str], max_entries: int, namespace: str):
+        self.path = path
+        self.columns = tuple(columns)
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        existing = [row[1] for row in self.connection.execute("PRAGMA table_info(results)")]
+        if existing and existing != ["key", *self.columns, "last_used"]:
+            # Written for other columns, by an older version of the code,
+            # whose entries would all miss anyway.
+            with self.connection:
+                self.connection.execute("DROP TABLE results")
+        columns_sql = ", ".join(self.columns)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS results "
+            f"(key TEXT PRIMARY KEY, {columns_sql}, last_used INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+        )
+        (self.clock,) = self.connection.execute(
+            "SELECT COALESCE(MAX(last_used), 0) FROM results"
+        ).fetchone()
+
+    def key(self, *parts: str) -> str:
+        return sha256("\0".join((self.namespace,) + parts))
+
+    def _tick(self) -> int:
+        self.clock += 1
+        return self.clock
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, tuple]:
+        """Look up `keys`, returning the found ones and marking them as used."""
+        found: dict[str, tuple] = {}
+        wanted = list(dict.fromkeys(keys))
+        columns_sql = ", ".join(self.columns)
+        batch_size = 500
+        with self.connection:
+            for i in range(0, len(wanted), batch_size):
+                batch = wanted[i:i + batch_size]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, {columns_sql} FROM results WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, *values in rows:
+                    found[key] = tuple(values)
+                self.connection.executemany(
+                    "UPDATE results SET last_used = ? WHERE key = ?",
+                    [(self._tick(), key) for key, *_ in rows],
+                )
+
+        self.hits += len(found)
+        self.misses += len(wanted) - len(found)
+        return found
+
+    def put_many(self, items: Iterable[tuple[str, tuple]]) -> None:
+        columns_sql = ", ".join(self.columns)
+        placeholders = ", ".join("?" * (len(self.columns) + 2))
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO results (key, {columns_sql}, last_used) "
+                f"VALUES ({placeholders})",
+                [(key, *values, self._tick()) for key, values in items],
+            )
+            self.evict()
+
+    def evict(self) -> None:
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self.connection.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self.evicted += excess
+
+    def report(self, file=sys.stderr) -> None:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0
+        print(
+            f"Cache '{self.path}': {self.hits} hits, {self.misses} misses "
+            f"({rate:.1%} hit rate), {self.evicted} evicted.",
+            file=file,
+        )
+
+    def close(self) -> None:
+        self.connection.close()
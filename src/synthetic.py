@@ -0,0 +1,138 @@
+#! /usr/bin/env python3
+
+"""Synthetic `individual-plasma` inputs, for benchmarks.
+
+Every record is the HXB2 reference of one region with random substitutions,
+insertions and deletions. Regions take turns, so the records are spread
+evenly over them. Everything is drawn from one seed, so the same arguments
+always give the same files.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+from typing import Iterator
+
+import numpy as np
+
+from Bio import SeqIO
+
+
+REFERENCES = "input/individual-plasma/hxb2"
+NUCLEOTIDES = np.frombuffer(b"ACGT", dtype=np.uint8)
+# Longest insertion or deletion, in codons.
+MAX_INDEL = 3
+LINE_WIDTH = 80
+
+
+def read_references(directory: str = REFERENCES) -> dict[str, bytes]:
+    """The reference sequence of each region, by region name."""
+    references = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.fasta"))):
+        (record,) = SeqIO.parse(path, "fasta")
+        name = os.path.splitext(os.path.basename(path))[0]
+        references[name] = str(record.seq).upper().encode()
+    if not references:
+        raise ValueError(f"No references in {directory!r}.")
+    return references
+
+
+def mutate(rng: np.random.Generator, reference: np.ndarray,
+           substitution_rate: float, indel_rate: float) -> bytes:
+    """`reference` with a substitution and an indel at each position with the given probabilities.
+
+    Substitutions always change the nucleotide. Insertions and deletions
+    are equally likely and of 1 to `MAX_INDEL` whole codons, so that they
+    keep the reading frame, as in intact sequences.
+    """
+    sequence = reference.copy()
+    substituted = np.flatnonzero(rng.random(len(sequence)) < substitution_rate)
+    if len(substituted):
+        current = np.searchsorted(NUCLEOTIDES, sequence[substituted])
+        shift = rng.integers(1, len(NUCLEOTIDES), size=len(substituted))
+        sequence[substituted] = NUCLEOTIDES[(current + shift) % len(NUCLEOTIDES)]
+
+    positions = np.flatnonzero(rng.random(len(sequence)) < indel_rate)
+    if len(positions) == 0:
+        return sequence.tobytes()
+
+    lengths = 3 * rng.integers(1, MAX_INDEL + 1, size=len(positions))
+    inserted = rng.random(len(positions)) < 0.5
+    parts = []
+    start = 0
+    for position, length, insertion in zip(positions.tolist(), lengths.tolist(), inserted.tolist()):
+        if position < start:
+            # Inside the previous deletion.
+            continue
+        parts.append(sequence[start:position])
+        if insertion:
+            parts.append(NUCLEOTIDES[rng.integers(0, len(NUCLEOTIDES), size=length)])
+            start = position
+        else:
+            start = position + length
+    parts.append(sequence[start:])
+    return np.concatenate(parts).tobytes()
+
+
+def generate(references: dict[str, bytes], records: int, seed: int = 0,
+             substitution_rate: float = 0.03, indel_rate: float = 0.002) -> Iterator[tuple[str, str, bytes]]:
+    """Region, identifier and sequence of each of `records` synthetic records."""
+    rng = np.random.default_rng(seed)
+    names = list(references)
+    arrays = {name: np.frombuffer(sequence, dtype=np.uint8) for name, sequence in references.items()}
+    for i in range(records):
+        name = names[i % len(names)]
+        yield name, f"SYN.{name}.{i}", mutate(rng, arrays[name], substitution_rate, indel_rate)
+
+
+def write_fasta(f, identifier: str, sequence: bytes):
+    f.write(b">" + identifier.encode() + b"\n")
+    for start in range(0, len(sequence), LINE_WIDTH):
+        f.write(sequence[start:start + LINE_WIDTH] + b"\n")
+
+
+def write_inputs(directory: str, records: int, seed: int = 0, substitution_rate: float = 0.03,
+                 indel_rate: float = 0.002, references: str = REFERENCES) -> dict[str, int]:
+    """Write `records` synthetic records as an `individual-plasma` input tree under `directory`.
+
+    That is one `seq/<region>.fasta` file per region, next to a copy of its
+    reference in `hxb2/<region>.fasta`. Returns the number of records of
+    each region.
+    """
+    sequences = read_references(references)
+    os.makedirs(os.path.join(directory, "seq"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "hxb2"), exist_ok=True)
+
+    files = {}
+    counts = dict.fromkeys(sequences, 0)
+    try:
+        for name in sequences:
+            shutil.copyfile(os.path.join(references, f"{name}.fasta"), os.path.join(directory, "hxb2", f"{name}.fasta"))
+            files[name] = open(os.path.join(directory, "seq", f"{name}.fasta"), "wb")
+        for name, identifier, sequence in generate(sequences, records, seed, substitution_rate, indel_rate):
+            write_fasta(files[name], identifier, sequence)
+            counts[name] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Write synthetic individual-plasma inputs: mutants of the HXB2 reference of each region.")
+    parser.add_argument("directory", help="Directory that gets the seq/ and hxb2/ subdirectories")
+    parser.add_argument("--records", type=int, default=1000, help="Records over all regions (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the mutations (default: 0)")
+    parser.add_argument("--substitution-rate", type=float, default=0.03, help="Probability of a substitution at each nucleotide (default: 0.03)")
+    parser.add_argument("--indel-rate", type=float, default=0.002, help="Probability of an insertion or deletion at each nucleotide (default: 0.002)")
+    args = parser.parse_args(argv)
+
+    counts = write_inputs(args.directory, args.records, args.seed, args.substitution_rate, args.indel_rate)
+    print(f"Wrote {sum(counts.values())} records of {len(counts)} regions to {args.directory!r}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))
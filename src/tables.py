@@ -0,0 +1,216 @@
+"""Reading and writing the pipeline's tables as CSV or as Parquet.
+
+A Parquet file holds exactly the typed columns that are parsed from the
+corresponding CSV file, with `qseqid` and `region` dictionary-encoded, so the
+two formats can be used interchangeably. Both readers support column
+projection: columns that are not asked for are not converted, and with Parquet
+not even read from disk.
+
+Loaded tables can also be kept in memory-mapped Arrow files, see
+`read_mapped`.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+PARQUET_SUFFIX = ".parquet"
+
+# Column types of the tables. `distance` stays float64 so that the reported
+# statistics do not change compared to parsing the text with `float`.
+COLUMN_TYPES = {
+    "qseqid": str,
+    "region": str,
+    "start": "int32",
+    "end": "int32",
+    "distance": "float64",
+    "distance_estimated": "bool",
+    "indel_impact": "float64",
+}
+
+# Columns with few distinct values, stored dictionary-encoded.
+CATEGORICAL_COLUMNS = ["qseqid", "region"]
+
+
+def is_parquet(path: os.PathLike | str) -> bool:
+    return Path(path).suffix == PARQUET_SUFFIX
+
+
+def resolve_table(path: Path) -> Path:
+    """The Parquet file next to the CSV file `path`, unless it is missing or stale."""
+    parquet = path.with_suffix(PARQUET_SUFFIX)
+    if parquet == path or not parquet.exists():
+        return path
+    if path.exists() and path.stat().st_mtime > parquet.stat().st_mtime:
+        return path
+    return parquet
+
+
+def read_header(path: os.PathLike | str) -> list[str]:
+    if is_parquet(path):
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def csv_options(header: Sequence[str], columns: Optional[Sequence[str]]) -> dict:
+    """Arguments of `pd.read_csv` that parse the CSV columns into their types."""
+    names = [name for name in header if columns is None or name in columns]
+    return dict(
+        usecols=names,
+        dtype={name: COLUMN_TYPES[name] for name in names if name in COLUMN_TYPES},
+        keep_default_na=False,
+        na_values={"distance": [""], "indel_impact": [""]},
+        # Parse floats exactly like Python's `float` does.
+        float_precision="round_trip",
+    )
+
+
+def read_chunks(
+    path: os.PathLike | str,
+    columns: Optional[Sequence[str]] = None,
+    chunksize: int = 100_000,
+) -> Iterator[pd.DataFrame]:
+    """Read the table at `path` in typed chunks of at most `chunksize` rows.
+
+    Only `columns` are read, if given. At least one, possibly empty, chunk is
+    produced.
+    """
+    header = read_header(path)
+    if columns is not None:
+        columns = [name for name in header if name in columns]
+
+    if is_parquet(path):
+        with pq.ParquetFile(path) as f:
+            empty = True
+            for batch in f.iter_batches(batch_size=chunksize, columns=columns):
+                empty = False
+                yield batch.to_pandas()
+            if empty:
+                schema = f.schema_arrow
+                if columns is not None:
+                    schema = pa.schema([schema.field(name) for name in columns])
+                yield schema.empty_table().to_pandas()
+        return
+
+    options = csv_options(header, columns)
+    empty = True
+    with pd.read_csv(path, chunksize=chunksize, **options) as reader:
+        for chunk in reader:
+            empty = False
+            yield chunk
+    if empty:
+        yield pd.read_csv(path, nrows=0, **options)
+
+
+def read_csv(path: os.PathLike | str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Read a whole CSV table with the typing rules of `read_chunks`."""
+    return pd.read_csv(path, **csv_options(read_header(path), columns))
+
+
+def write_parquet(table: pd.DataFrame, path: os.PathLike | str) -> None:
+    """Write `table` to `path`, replacing the file only once it is complete."""
+    table = table.copy()
+    for column in CATEGORICAL_COLUMNS:
+        if column in table:
+            table[column] = table[column].astype("category")
+
+    partial = f"{path}.partial"
+    table.to_parquet(partial, engine="pyarrow", index=False)
+    os.replace(partial, path)
+
+
+def file_sha256(path: os.PathLike | str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def describe_sources(paths: Sequence[Path]) -> list[dict]:
+    """What a mapped table is checked against: path, size, mtime and hash of each file."""
+    sources = []
+    for path in paths:
+        stat = path.stat()
+        sources.append({
+            "path": str(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_sha256(path),
+        })
+    return sources
+
+
+def is_current(source: dict) -> bool:
+    """Whether a file is unchanged since `describe_sources` was called on it.
+
+    The hash is only computed when the size or mtime differ, so that files
+    that were rewritten with the same content still count as current.
+    """
+    try:
+        stat = os.stat(source["path"])
+    except FileNotFoundError:
+        return False
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+    return file_sha256(source["path"]) == source["sha256"]
+
+
+def read_mapped(path: Path, key: str, sources: Sequence[Path]) -> Optional[pd.DataFrame]:
+    """The table stored by `write_mapped` under `key`, if `sources` did not change since.
+
+    The file is memory-mapped, and numeric columns are read-only views onto
+    it. Processes that map the same file therefore share one copy of those
+    columns in the page cache. A missing, truncated or otherwise unreadable
+    file counts as a miss, and is replaced by the next `write_mapped`.
+    """
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        metadata = json.loads((reader.schema.metadata or {}).get(b"hivstats", b"{}"))
+    except (OSError, pa.ArrowInvalid, json.JSONDecodeError):
+        return None
+
+    recorded = metadata.get("sources", [])
+    if metadata.get("key") != key \
+       or [source["path"] for source in recorded] != [str(source) for source in sources] \
+       or not all(is_current(source) for source in recorded):
+        return None
+
+    try:
+        table = reader.read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return table.to_pandas(split_blocks=True)
+
+
+def write_mapped(table: pd.DataFrame, path: Path, key: str, sources: list[dict]) -> None:
+    """Store `table` as an uncompressed Arrow file that `read_mapped` can map.
+
+    `sources` is the result of `describe_sources` from before `table` was
+    computed. The file is replaced atomically, so processes that still map an
+    older version keep reading that one.
+    """
+    arrow = pa.Table.from_pandas(table, preserve_index=False)
+    # Keep NaN as NaN rather than null, so that float columns stay zero-copy.
+    for i, name in enumerate(arrow.column_names):
+        if pd.api.types.is_float_dtype(table[name]):
+            arrow = arrow.set_column(i, name, pa.array(table[name].to_numpy(), from_pandas=False))
+    metadata = dict(arrow.schema.metadata or {})
+    metadata[b"hivstats"] = json.dumps({"key": key, "sources": sources}).encode()
+    arrow = arrow.replace_schema_metadata(metadata)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{os.getpid()}.partial")
+    try:
+        with pa.OSFile(str(partial), "wb") as sink, pa.ipc.new_file(sink, arrow.schema) as writer:
+            writer.write_table(arrow)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+
+"""Check `aligner_distance` against the distance that the notebook and
+`make-individual-plasma-csv` computed before it, from the best alignment of
+`PairwiseAligner.align(...)`, for the shipped vpu and nef proteins.
+
+The distances must be exactly equal, so that the CSV files do not change.
+The scaled score of the fast path and the banded alignment must agree with
+the unscaled optimum, see `protein_distance.SCORE_SCALE`."""
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+from protein_distance import MATCH_SCORE, SCORE_SCALE, aligner_distance, make_aligner, scorer
+from translation import best_frames, translate
+
+
+REGIONS = ["vpu", "nef"]
+
+
+def load_script(name):
+    """Import the script `name` of this directory, which has no .py extension."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    loader = importlib.machinery.SourceFileLoader(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+
+def main(argv) -> int:
+    pipeline = load_script("make-individual-plasma-csv")
+    # The aligner of the old code, which took the first alignment.
+    old_aligner = make_aligner()
+    failures = 0
+    total = 0
+    for name in REGIONS:
+        path = f"input/individual-plasma/seq/{name}.fasta"
+        if not os.path.exists(path):
+            continue
+        reference_aminoacids = translate(pipeline.process_fasta(f"input/individual-plasma/hxb2/{name}.fasta")[0][1])
+        sequences = pipeline.process_fasta(path)
+        aminoacids_list = best_frames([sequence for _, sequence in sequences], reference_aminoacids)
+
+        for (sequence_id, _), aminoacids in zip(sequences, aminoacids_list):
+            protein = pipeline.get_protein(aminoacids)
+            if not protein:
+                continue
+            total += 1
+            score = old_aligner.align(protein, reference_aminoacids)[0].score
+            expected = MATCH_SCORE - score / len(protein)
+            distance = aligner_distance(protein, reference_aminoacids)
+            if round(score * SCORE_SCALE) != round(scorer.score(protein, reference_aminoacids)):
+                print(f"{path}: {sequence_id}: optimal score differs", file=sys.stderr)
+                failures += 1
+            elif distance != expected:
+                print(f"{path}: {sequence_id}: distance {distance!r} differs from {expected!r}", file=sys.stderr)
+                failures += 1
+
+    if total == 0:
+        print("No sequences found; run this from the repository root.", file=sys.stderr)
+        return 1
+
+    print(f"{total - failures} of {total} distances match.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))
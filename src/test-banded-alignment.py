@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+
+"""Check that the banded alignment of `protein_distance` gives the same
+scores as the unbanded aligner, for mutants of every shipped HXB2 protein
+with substitutions, insertions and deletions."""
+
+import glob
+import random
+import sys
+
+from Bio import SeqIO
+
+import protein_distance
+from protein_distance import banded_alignment_scores, scorer
+from translation import translate
+
+
+AMINOACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def mutate(rng, protein, mutations):
+    residues = list(protein)
+    for _ in range(mutations):
+        position = rng.randrange(len(residues) + 1)
+        kind = rng.random()
+        if kind < 0.8 and position < len(residues):
+            residues[position] = rng.choice(AMINOACIDS)
+        elif kind < 0.9:
+            residues[position:position] = rng.choices(AMINOACIDS, k=rng.randint(1, 10))
+        else:
+            del residues[position:position + rng.randint(1, 10)]
+    return "".join(residues) or "M"
+
+
+def main(argv) -> int:
+    # Short references would otherwise be left to the unbanded aligner.
+    protein_distance.MIN_BANDED_REFERENCE = 0
+    rng = random.Random(0)
+    failures = 0
+    total = 0
+    for path in sorted(glob.glob("input/individual-plasma/hxb2/*.fasta")):
+        (reference,) = SeqIO.parse(path, "fasta")
+        reference_aminoacids = translate(str(reference.seq)).rstrip("*")
+        queries = [mutate(rng, reference_aminoacids, rng.randint(0, len(reference_aminoacids) // 4))
+                   for _ in range(200)]
+        for query, score in zip(queries, banded_alignment_scores(queries, reference_aminoacids)):
+            if score != round(scorer.score(query, reference_aminoacids)):
+                print(f"{path}: {query}: score differs", file=sys.stderr)
+                failures += 1
+        total += len(queries)
+
+    if total == 0:
+        print("No references found; run this from the repository root.", file=sys.stderr)
+        return 1
+
+    print(f"{total - failures} of {total} scores match.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))
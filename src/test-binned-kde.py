@@ -0,0 +1,60 @@
+#! /usr/bin/env python3
+
+"""Check that the binned KDE of `mynotebook` stays close to the exact
+`gaussian_kde`, for a smooth sample, for a narrow-spread sample with
+outliers, and for a bandwidth so narrow that the grid of `binned_kde` is
+capped, in which case `compute_kde(..., method="auto")` must be exact."""
+
+import sys
+
+import numpy as np
+
+import mynotebook
+from mynotebook import binned_kde_refinement, compute_kde
+
+
+def deviation(scores, bw_method=None):
+    """Largest difference between the binned and the exact KDE, relative to the peak of the exact one."""
+    _, exact = compute_kde(scores, bw_method=bw_method, method="exact")
+    _, binned = compute_kde(scores, bw_method=bw_method, method="binned")
+    return np.abs(binned - exact).max() / exact.max()
+
+
+def main(argv) -> int:
+    rng = np.random.default_rng(0)
+    failures = 0
+
+    normal = rng.normal(size=20000)
+    # Distances: most close to the reference, a few far from it.
+    narrow = np.concatenate([rng.normal(0.05, 0.001, size=20000), rng.uniform(0, 2, size=20)])
+    # Bandwidth factor of the capped case, and of its KDE over `x_vals`.
+    factor = 1e-5
+    x_vals = np.linspace(normal.min() - 0.1 * np.ptp(normal), normal.max() + 0.1 * np.ptp(normal), 1000)
+    capped = binned_kde_refinement(x_vals, factor * normal.std(ddof=1)) > mynotebook.BINNED_KDE_MAX_GRID_POINTS // len(x_vals)
+    if not capped:
+        print("The capped case fits in the grid of binned_kde.", file=sys.stderr)
+        failures += 1
+
+    for name, scores, bw_method, bound in [
+        ("normal", normal, None, 1e-4),
+        ("narrow", narrow, None, 1e-2),
+        ("capped", normal, factor, 0.1),
+    ]:
+        found = deviation(scores, bw_method)
+        print(f"{name}: binned KDE off by {found:.2g} of the peak.")
+        if found > bound:
+            print(f"{name}: more than {bound:.2g}", file=sys.stderr)
+            failures += 1
+
+    _, exact = compute_kde(normal, bw_method=factor, method="exact")
+    _, auto = compute_kde(normal, bw_method=factor, method="auto")
+    if not np.array_equal(auto, exact):
+        print("capped: 'auto' is not the exact KDE", file=sys.stderr)
+        failures += 1
+
+    print("The binned KDE is within bounds." if not failures else f"{failures} KDE checks failed.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))
@@ -0,0 +1,63 @@
+#! /usr/bin/env python3
+
+"""Check that importing print_results.py loads none of the plotting, KDE
+and alignment libraries, and that it takes less than a time budget."""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+
+# Top-level packages that the text statistics do not need.
+HEAVY = ["matplotlib", "scipy", "Bio", "Levenshtein", "jarowinkler", "protein_distance", "ipywidgets"]
+
+
+def run_import(module, *options):
+    environment = dict(os.environ, PYTHONPATH=SRC)
+    return subprocess.run([sys.executable, *options, "-c", f"import {module}"],
+                          env=environment, capture_output=True, text=True, check=True)
+
+
+def imported_modules(module):
+    """Names of all modules that importing `module` loads, from `python -X importtime`."""
+    names = []
+    for line in run_import(module, "-X", "importtime").stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            if name != "imported package":
+                names.append(name)
+    return names
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds that starting Python and importing print_results may take (default: 1.0)")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports timed, of which the fastest counts (default: 3)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    heavy = sorted({name.split(".")[0] for name in imported_modules("print_results")} & set(HEAVY))
+    if heavy:
+        print(f"print_results imports {', '.join(heavy)}", file=sys.stderr)
+        failures += 1
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        run_import("print_results")
+        best = min(best, time.perf_counter() - start)
+    if best > args.budget:
+        print(f"Importing print_results takes {best:.2f} s, more than {args.budget:.2f} s", file=sys.stderr)
+        failures += 1
+
+    print(f"Importing print_results takes {best:.2f} s and loads none of {', '.join(HEAVY)}."
+          if not failures else f"{failures} import checks failed.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))
@@ -0,0 +1,53 @@
+#! /usr/bin/env python3
+
+"""Check that the batched frame selection of `translation` picks the same
+translations as one Biopython translation and one `jaro_similarity` call
+per frame, over all shipped individual-plasma sequences."""
+
+import glob
+import os
+import sys
+
+from Bio import SeqIO
+from jarowinkler import jaro_similarity
+
+from translation import best_frames, translate, translate_frames
+
+
+def expected_aminos(query, reference_aminoacids):
+    return max([translate(query, frame) for frame in range(3)],
+               key=lambda y: jaro_similarity(y, reference_aminoacids))
+
+
+def main(argv) -> int:
+    failures = 0
+    total = 0
+    for path in sorted(glob.glob("input/individual-plasma/seq/*.fasta")):
+        reference_path = os.path.join("input/individual-plasma/hxb2", os.path.basename(path))
+        (reference,) = SeqIO.parse(reference_path, "fasta")
+        reference_aminoacids = translate(str(reference.seq))
+        records = list(SeqIO.parse(path, "fasta"))
+        ids = [record.id for record in records]
+        sequences = [str(record.seq) for record in records]
+
+        frames = translate_frames(sequences)
+        chosen = best_frames(sequences, reference_aminoacids)
+        for sequence_id, sequence, translations, aminos in zip(ids, sequences, frames, chosen):
+            if translations != tuple(translate(sequence, frame) for frame in range(3)):
+                print(f"{path}: {sequence_id}: translations differ", file=sys.stderr)
+                failures += 1
+            elif aminos != expected_aminos(sequence, reference_aminoacids):
+                print(f"{path}: {sequence_id}: chosen frame differs", file=sys.stderr)
+                failures += 1
+        total += len(sequences)
+
+    if total == 0:
+        print("No sequences found; run this from the repository root.", file=sys.stderr)
+        return 1
+
+    print(f"{total - failures} of {total} sequences match.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))
@@ -0,0 +1,105 @@
+#! /bin/sh
+
+# Checks src/run-cfeintact-sharded and src/run-cfeintact-incremental against
+# a stub `cfeintact`, which writes one row per record and fails on records
+# named in $STUB_FAIL_ON.
+
+set -xe
+
+PYTHON="${PYTHON:-uv run python --}"
+SCRIPT="$PWD/src/run-cfeintact-sharded"
+INCREMENTAL="$PWD/src/run-cfeintact-incremental"
+WORK="$(mktemp -d)"
+trap 'rm -rf -- "$WORK"' EXIT
+cd -- "$WORK"
+
+cat > cfeintact <<'STUB'
+#! /bin/sh
+set -e
+if test "$1" = "version"
+then
+	echo "stub ${STUB_VERSION:-1.0}"
+	exit 0
+fi
+# check --output DIR --subtype all FASTA
+OUTPUT="$3"
+FASTA="$6"
+echo "$FASTA $(grep -c '^>' "$FASTA")" >> "$(dirname -- "$0")"/calls.txt
+if test -n "$STUB_FAIL_ON" && grep -q -x ">$STUB_FAIL_ON" "$FASTA"
+then
+	exit 1
+fi
+mkdir -p -- "$OUTPUT"
+awk -v regions="$OUTPUT/regions.csv" -v defects="$OUTPUT/defects.csv" '
+	function flush() { if (name != "") print name ",genome," length(seq) > regions }
+	BEGIN { print "qseqid,region,length" > regions; print "qseqid,code" > defects }
+	/^>/ { flush(); name = substr($0, 2); seq = ""
+	       if (name ~ /[37]$/) print name ",Deletion" > defects
+	       next }
+	{ seq = seq $0 }
+	END { flush() }
+' "$FASTA"
+STUB
+chmod +x cfeintact
+
+for i in $(seq 1 10)
+do
+	printf '>seq%s\nACGT\n%s\n' "$i" "$(printf 'A%.0s' $(seq 1 "$i"))"
+done > input.fasta
+
+# Unsharded reference.
+./cfeintact check --output expected --subtype all input.fasta
+rm calls.txt
+
+# A failing shard does not stop the others, and the merge does not happen.
+if STUB_FAIL_ON=seq5 $PYTHON "$SCRIPT" --shards 3 --cfeintact "$WORK/cfeintact" --output sharded input.fasta
+then
+	exit 1
+fi
+test ! -e sharded/regions.csv
+test "$(wc -l < calls.txt)" -eq 3
+
+# Rerunning only redoes the failed shard.
+rm calls.txt
+$PYTHON "$SCRIPT" --shards 3 --cfeintact "$WORK/cfeintact" --output sharded input.fasta
+test "$(wc -l < calls.txt)" -eq 1
+grep -q -x '>seq5' "$(cut -d ' ' -f 1 calls.txt)"
+
+# Merged outputs are the same as those of one CFEIntact run, in the same order.
+cmp expected/regions.csv sharded/regions.csv
+cmp expected/defects.csv sharded/defects.csv
+test "$(cat sharded/cfeintact-version.txt)" = "stub 1.0"
+
+# Nothing to do once all shards are done.
+rm calls.txt
+$PYTHON "$SCRIPT" --shards 3 --cfeintact "$WORK/cfeintact" --output sharded input.fasta
+test ! -e calls.txt
+
+# Incremental mode: the first run checks everything.
+rm -f calls.txt
+$PYTHON "$INCREMENTAL" --cfeintact "$WORK/cfeintact" --output incremental input.fasta
+test "$(wc -l < calls.txt)" -eq 1
+cmp expected/regions.csv incremental/regions.csv
+
+# A changed, a removed and an appended record; only the first and last are checked.
+rm calls.txt
+sed -e '/^>seq2$/{n;s/ACGT/ACGTT/}' -e '/^>seq4$/,+2d' input.fasta > changed.fasta
+printf '>seq11\nACGTACGT\n' >> changed.fasta
+./cfeintact check --output expected-changed --subtype all changed.fasta
+rm calls.txt
+$PYTHON "$INCREMENTAL" --cfeintact "$WORK/cfeintact" --output incremental changed.fasta
+test "$(wc -l < calls.txt)" -eq 1
+test "$(cut -d ' ' -f 2 calls.txt)" -eq 2
+cmp expected-changed/regions.csv incremental/regions.csv
+cmp expected-changed/defects.csv incremental/defects.csv
+
+# Nothing changed: CFEIntact is not run.
+rm calls.txt
+$PYTHON "$INCREMENTAL" --cfeintact "$WORK/cfeintact" --output incremental changed.fasta
+test ! -e calls.txt
+
+# A new CFEIntact version checks everything again.
+rm -f calls.txt
+STUB_VERSION=2.0 $PYTHON "$INCREMENTAL" --cfeintact "$WORK/cfeintact" --output incremental changed.fasta
+test "$(cut -d ' ' -f 2 calls.txt)" -eq 10
+test "$(cat incremental/cfeintact-version.txt)" = "stub 2.0"
@@ -0,0 +1,113 @@
+"""Translation and reading-frame selection for many sequences at once.
+
+Nucleotides are encoded into a NumPy array and translated through a codon
+lookup table that is built by asking Biopython to translate every codon over
+the IUPAC alphabet. The result is therefore exactly that of `Seq.translate`
+with the standard table. Sequences with any other character are translated
+by Biopython itself, so they also fail in the same way.
+"""
+
+from itertools import product
+from typing import Sequence
+
+import numpy as np
+from Bio import Seq
+from Bio.Data.CodonTable import TranslationError
+from rapidfuzz import process
+from rapidfuzz.distance import Jaro
+
+
+NUCLEOTIDES = "ACGTURYSWKMBDHVN"
+INVALID = 255
+
+# Nucleotide byte -> index into NUCLEOTIDES, case-insensitive, like Biopython.
+NUCLEOTIDE_CODES = np.full(256, INVALID, dtype=np.uint8)
+for i, letter in enumerate(NUCLEOTIDES):
+    NUCLEOTIDE_CODES[ord(letter)] = i
+    NUCLEOTIDE_CODES[ord(letter.lower())] = i
+
+PADDING = NUCLEOTIDES.index("N")
+
+
+def build_codon_table() -> np.ndarray:
+    """Amino acid byte of each codon, indexed by its three nucleotide codes in base 16."""
+    n = len(NUCLEOTIDES)
+    table = np.full(n ** 3, INVALID, dtype=np.uint8)
+    for i, codon in enumerate(product(NUCLEOTIDES, repeat=3)):
+        try:
+            table[i] = ord(Seq.translate("".join(codon)))
+        except (TranslationError, KeyError):
+            pass
+    return table
+
+
+CODON_TABLE = build_codon_table()
+
+
+def translate(seq: str, frame: int = 0) -> str:
+    """Translate `seq` from `frame` on with Biopython, padding the last codon with `N`."""
+    for_translation = seq[frame:]
+    for_translation += 'N' * ({0: 0, 1: 2, 2: 1}[len(for_translation) % 3])
+    return Seq.translate(for_translation)
+
+
+def translate_frames(sequences: Sequence[str]) -> list[tuple[str, str, str]]:
+    """Translations of the three forward frames of each of `sequences`.
+
+    The same as `translate(sequence, frame)` for frames 0, 1 and 2.
+    """
+    if not sequences:
+        return []
+
+    # All sequences in one array, each followed by two `N`s that complete
+    # its last codon in every frame.
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    starts = np.zeros(len(sequences), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 2, out=starts[1:])
+    codes = np.full(int(lengths.sum()) + 2 * len(sequences), PADDING, dtype=np.uint8)
+    joined = "".join(sequences).encode("ascii", errors="replace")
+    positions = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths[:-1])]), lengths)
+    positions += np.arange(len(joined), dtype=np.int64)
+    codes[positions] = NUCLEOTIDE_CODES[np.frombuffer(joined, dtype=np.uint8)]
+
+    frames = []
+    for frame in range(3):
+        counts = np.maximum(lengths - frame + 2, 0) // 3
+        first = np.repeat(starts + frame - 3 * np.concatenate([[0], np.cumsum(counts[:-1])]), counts)
+        first += 3 * np.arange(int(counts.sum()), dtype=np.int64)
+        index = codes[first].astype(np.int64) << 8 | codes[first + 1].astype(np.int64) << 4 | codes[first + 2]
+        valid = (codes[first] != INVALID) & (codes[first + 1] != INVALID) & (codes[first + 2] != INVALID)
+        aminos = np.where(valid, CODON_TABLE[index & 0xFFF], INVALID)
+        frames.append((aminos, np.concatenate([[0], np.cumsum(counts)])))
+
+    result = []
+    for i, sequence in enumerate(sequences):
+        translations = []
+        for aminos, offsets in frames:
+            translated = aminos[offsets[i]:offsets[i + 1]]
+            if (translated == INVALID).any():
+                break
+            translations.append(translated.tobytes().decode("ascii"))
+        else:
+            result.append(tuple(translations))
+            continue
+
+        # Characters outside the table: let Biopython decide, or complain.
+        result.append(tuple(translate(sequence, frame) for frame in range(3)))
+    return result
+
+
+def best_frames(sequences: Sequence[str], reference_aminoacids: str) -> list[str]:
+    """The translation of each of `sequences` most Jaro-similar to `reference_aminoacids`.
+
+    Ties go to the lowest frame.
+    """
+    translations = translate_frames(sequences)
+    if not translations:
+        return []
+
+    candidates = [translation for frames in translations for translation in frames]
+    scores = process.cdist(candidates, [reference_aminoacids],
+                           scorer=Jaro.similarity, dtype=np.float64)
+    best = scores[:, 0].reshape(-1, 3).argmax(axis=1)
+    return [frames[frame] for frames, frame in zip(translations, best)]